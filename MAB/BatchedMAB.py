@@ -0,0 +1,210 @@
+import math
+import numpy as np
+from rewards import BatchedRewardSource
+from SequentialHalvingMAB import top_positions
+
+
+class BatchedBandit:
+    """
+    Per-problem statistics shared by the batched (lockstep) algorithms: visits, reward sums and
+    means as (num_problems, k) arrays, plus the surviving arms of the halving algorithms and the
+    incrementally maintained best arm of every problem (see SequentialHalvingMAB.BestArm).
+    """
+
+    def __init__(self, num_problems, k):
+        """
+        :param num_problems: The number of MAB problems advanced in lockstep.
+        :param k: The number of arms per problem.
+        """
+        self.num_problems = num_problems
+        self.k = k
+        self.rows = np.arange(num_problems)
+        self.visits = np.zeros((num_problems, k), dtype=np.int64)
+        self.total_rewards = np.zeros((num_problems, k))
+        self.total_means = np.zeros((num_problems, k))
+        self.survivors = np.tile(np.arange(k), (num_problems, 1)) #Surviving arms per problem, best first after every halving
+        self.num_survivors = k
+        self.by_mean = np.full(num_problems, -1) #Best arm by mean per problem, -1 before any pull
+        self.best_mean = np.full(num_problems, -np.inf)
+        self.by_visits = np.zeros(num_problems, dtype=np.int64)
+        self.stale = np.zeros(num_problems, dtype=bool) #Problems whose best arm's mean dropped
+
+    def halve(self, keep):
+        """
+        Keep the `keep` surviving arms with the highest means in every problem, ordered best first.
+        Ties keep the current survivor order. The kept arms are picked with an O(k) partial
+        selection per problem (top_positions), so only they are sorted.
+        """
+        alive = self.survivors[:, :self.num_survivors]
+        means = np.take_along_axis(self.total_means, alive, axis=1)
+        kept = top_positions(means, keep)
+        order = np.argsort(-np.take_along_axis(means, kept, axis=1), axis=1, kind="stable")
+        self.survivors[:, :keep] = np.take_along_axis(alive, np.take_along_axis(kept, order, axis=1), axis=1)
+        self.num_survivors = keep
+
+    def observe_reward(self, arms, rewards) -> None:
+        """
+        :param arms: The arm played in every problem, shape (num_problems,).
+        :param rewards: The reward received in every problem, shape (num_problems,).
+        """
+        # Every problem pulls exactly one arm per step, so (row, arm) pairs never repeat.
+        rows = self.rows
+        self.visits[rows, arms] += 1
+        self.total_rewards[rows, arms] += rewards
+        self.total_means[rows, arms] = self.total_rewards[rows, arms] / self.visits[rows, arms]
+
+        means = self.total_means[rows, arms]
+        was_best = arms == self.by_mean
+        self.stale |= was_best & (means < self.best_mean)
+        better = ~self.stale & ((means > self.best_mean) | ((means == self.best_mean) & (arms <= self.by_mean)))
+        self.by_mean = np.where(better, arms, self.by_mean)
+        self.best_mean = np.where(better, means, self.best_mean)
+
+        visits = self.visits[rows, arms]
+        best_visits = self.visits[rows, self.by_visits]
+        better = (visits > best_visits) | ((visits == best_visits) & (arms < self.by_visits))
+        self.by_visits = np.where(better, arms, self.by_visits)
+
+    def recommend(self, by="mean") -> np.ndarray:
+        """
+        The arm every problem would play if it was stopped now, in O(num_problems) (plus O(k) for
+        each problem whose best arm's mean dropped since the last query).
+
+        :param by: "mean" for the pulled arm with the highest observed mean, "visits" for the most
+                   pulled arm.
+        :return: The best arm of every problem, arm 0 before any pull.
+        """
+        if by == "visits": return self.by_visits
+        if by != "mean": raise ValueError(f"Unknown recommendation criterion: {by}")
+        stale = np.flatnonzero(self.stale)
+        if len(stale) > 0:
+            means = np.where(self.visits[stale] > 0, self.total_means[stale], -np.inf)
+            self.by_mean[stale] = np.argmax(means, axis=1)
+            self.best_mean[stale] = self.total_means[stale, self.by_mean[stale]]
+            self.stale[stale] = False
+        return np.maximum(self.by_mean, 0)
+
+
+class BatchedSequentialHalvingAlg(BatchedBandit):
+    """
+    Lockstep version of SequentialHalvingAlg that runs every MAB problem of a (num_problems, k)
+    means matrix at once.
+
+    The halving schedule only depends on k and the budget, so the round counters and the index of
+    the arm being pulled are shared scalars; only the surviving arms and the statistics are kept per
+    problem, as (num_problems, k) arrays. Every call to choose_arm/observe_reward advances all
+    problems by one pull, and produces the same pulls as SequentialHalvingAlg would per problem.
+    """
+
+    def __init__(self, num_problems, k=10, time_steps_per_problem=1000):
+        """
+        :param num_problems: The number of MAB problems advanced in lockstep.
+        :param k: The number of arms per problem.
+        :param time_steps_per_problem: The iteration budget of every problem.
+        """
+        super().__init__(num_problems, k)
+        self.time_steps_per_problem = time_steps_per_problem
+        self.current_iteration = 0
+        self.current_arm_idx = 0
+        self.phases = math.ceil(math.log2(k))
+        self.round_time = time_steps_per_problem/self.phases
+
+    def choose_arm(self) -> np.ndarray:
+        """
+        :return: The arm to pull in every problem, shape (num_problems,).
+        """
+        if self.current_iteration == self.round_time:
+            self.current_iteration = 0
+            self.halve(math.ceil(self.num_survivors/2))
+            self.current_arm_idx = 0
+            return self.survivors[:, 0]
+
+        self.current_arm_idx = self.current_arm_idx + 1
+        if self.current_arm_idx >= self.num_survivors: self.current_arm_idx = 0
+        self.current_iteration = self.current_iteration + 1
+        return self.survivors[:, self.current_arm_idx]
+
+
+class BatchedSequentialHalvingAlgAnyTime_v1(BatchedBandit):
+    """
+    Lockstep version of SequentialHalvingAlgAnyTime_v1 over a (num_problems, k) means matrix.
+
+    Anytime SH has no fixed end, so the batched engine is driven by a number of pulls instead of a
+    time budget; the pull sequence per problem matches the single-problem class.
+    """
+
+    def __init__(self, num_problems, k=10):
+        """
+        :param num_problems: The number of MAB problems advanced in lockstep.
+        :param k: The number of arms per problem.
+        """
+        super().__init__(num_problems, k)
+        self.keys_idx = 0
+        self.round_iter = 0
+
+    def choose_arm(self) -> np.ndarray:
+        """
+        :return: The arm to pull in every problem, shape (num_problems,).
+        """
+        if self.round_iter >= self.k:
+            self.round_iter = 0
+            if self.num_survivors <= 2:
+                self.survivors[:] = np.arange(self.k)
+                self.num_survivors = self.k
+            else:
+                self.halve(max(2, math.ceil(self.num_survivors/2)))
+            self.keys_idx = 0
+        else:
+            self.round_iter = self.round_iter + 1
+            self.keys_idx = self.keys_idx + 1
+            if self.keys_idx >= self.num_survivors: self.keys_idx = 0
+
+        return self.survivors[:, self.keys_idx]
+
+
+class BatchedUCB1(BatchedBandit):
+    """
+    Lockstep version of UCB1 over a (num_problems, k) means matrix, driven by a number of pulls.
+    """
+
+    def __init__(self, C: float, num_problems, numarms):
+        """
+        :param C: The exploration parameter C.
+        :param num_problems: The number of MAB problems advanced in lockstep.
+        :param numarms: The number of arms per problem.
+        """
+        super().__init__(num_problems, numarms)
+        self.C = C
+        self.t = 0
+
+    def choose_arm(self) -> np.ndarray:
+        """
+        :return: The arm to pull in every problem, shape (num_problems,).
+        """
+        self.t = self.t + 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bonus = self.C * np.sqrt(math.log(self.t) / self.visits)
+        ucbs = np.where(self.visits == 0, np.inf, self.total_means + bonus)
+        return np.argmax(ucbs, axis=1)
+
+    def __str__(self):
+        return f"BatchedUCB1({self.C:.3f})"
+
+
+def run_batched(algo, arm_means, iterations, source=None):
+    """
+    Advance a batched algorithm for `iterations` pulls, drawing Gaussian rewards (unit variance)
+    around the means of the arms pulled in every problem.
+
+    :param algo: A batched algorithm whose num_problems matches the rows of arm_means.
+    :param arm_means: (num_problems, k) matrix of true arm means.
+    :param iterations: The number of pulls per problem.
+    :param source: The BatchedRewardSource to draw from. Pass a seeded one for reproducible runs,
+                   the default draws from fresh entropy.
+    :return: The per-problem recommended arms.
+    """
+    if source is None: source = BatchedRewardSource(arm_means, scale=1.0)
+    for _ in range(iterations):
+        arms = algo.choose_arm()
+        algo.observe_reward(arms, source.rewards(arms))
+    return algo.recommend()
@@ -3,21 +3,33 @@ import time
 from matplotlib import pyplot as plt
 import numpy as np
 import pandas as pd
-from scipy.stats import norm
 import SequentialHalvingMAB as sh
+import BatchedMAB as bm
+import analysis
+import metrics
+import parallel
+import sweep
+from clocks import WALL_TIMER, VirtualTimer
+from rewards import RewardSource, BatchedRewardSource
+from seeding import ExperimentSeeds
+from cache import CellCache, code_version
+from streaming import RunningStats
 import csv
+import weakref
+import zlib
+from concurrent.futures import as_completed
 from tqdm import tqdm
 
 
 class MAB_Experiment_runner:
-    def __init__(self, num_arms, means_amt):
+    def __init__(self, num_arms, means_amt, seed=2079):
         self.means_amt = means_amt
         self.num_arms = num_arms
+        self.seeds = ExperimentSeeds(seed) #Every problem, algorithm, budget and repetition gets its own stream
         self.arm_means = self.generate_means()
-        np.random.seed(2079) 
             
     def generate_means(self):
-        arm_means = np.random.normal(loc=0.0, scale=1.0, size=(self.means_amt, self.num_arms))
+        arm_means = sh.generate_arm_means(self.means_amt, self.num_arms, seed=self.seeds.means())
         return arm_means
         
     def run_sh_base_experiment(self, iterations, arm_means_idx):
@@ -25,14 +37,8 @@ class MAB_Experiment_runner:
         
         start_time = int(round(time.time() * 1000))
         
-        rewards = np.zeros(iterations)
-        for t in range(iterations):
-            arm = algo.choose_arm()
-
-            reward = norm.rvs(loc=self.arm_means[arm_means_idx,:][arm], scale=1.0)
-
-            algo.observe_reward(arm, reward)
-            rewards[t] = reward  
+        source = self.reward_source(arm_means_idx, "iteration", iterations)
+        algo.run_until(source, iterations) #One reward draw per halving phase
         
         history = algo.hist
         
@@ -68,11 +74,11 @@ class MAB_Experiment_runner:
         
     
     def plot_sh_experiment(self, history,mean_idx, iterations=None, time_budget=None, type="baseline"):
-        frequencies = [history.count(i) for i in range(self.num_arms)]
+        frequencies = analysis.pull_counts(history, self.num_arms)
 
         # Sort arms based on their means
-        sorted_indices = sorted(range(self.num_arms), key=lambda x: self.arm_means[mean_idx, x])
-        sorted_frequencies = [frequencies[i] for i in sorted_indices]
+        sorted_indices = analysis.order_by_means(self.arm_means[mean_idx, :])
+        sorted_frequencies = frequencies[sorted_indices]
 
         # Plotting the distribution of counts per arm in ascending order
         plt.bar(range(self.num_arms), sorted_frequencies, tick_label=[f'{i}' for i in sorted_indices])
@@ -89,30 +95,16 @@ class MAB_Experiment_runner:
     def run_sh_anytime_experiment(self, time_budget_ms, arm_means_idx):
         algo = sh.SequentialHalvingAlgAnyTime_v1(time_budget_ms, True, self.num_arms)
         arm_means_idx = int(arm_means_idx)
-        rewards = []
-        
-        while int(round(time.time() * 1000)) < algo.stop_time:
-            arm = algo.choose_arm()
-            reward = norm.rvs(loc=self.arm_means[arm_means_idx,:][arm], scale=1.0)
-            algo.observe_reward(arm, reward)
-            rewards.append(reward)
+        source = self.reward_source(arm_means_idx, "anytime", time_budget_ms)
+        algo.run_until(source)
             
         return algo.hist
     
     def run_sh_time_budget_experiment(self, time_budget_ms, arm_means_idx):
         algo = sh.SequentialHalvingAlgTime_v1(time_budget_ms, True, self.num_arms)
         
-        rewards = []
-
-        start_time = int(round(time.time() * 1000)) 
-        while int(round(time.time() * 1000)) - start_time < time_budget_ms:
-            arm = algo.choose_arm()
-            arm_means_idx = int(arm_means_idx)
-            #print("arm: ", arm)
-            reward = norm.rvs(loc=self.arm_means[arm_means_idx,:][arm], scale=1.0)
-
-            algo.observe_reward(arm, reward)
-            rewards.append(reward)  
+        source = self.reward_source(int(arm_means_idx), "time", time_budget_ms)
+        algo.run_until(source)
                 
         history = algo.hist
         return history
@@ -120,16 +112,8 @@ class MAB_Experiment_runner:
     def run_sh_time_budget_experiment2(self, time_budget_ms, arm_means_idx):
         algo = sh.SequentialHalvingAlgTime_v1(time_budget_ms, True, self.num_arms)
         
-        rewards = []
-
-        start_time = int(round(time.time() * 1000)) 
-        while int(round(time.time() * 1000)) - start_time < time_budget_ms:
-            arm = algo.choose_arm()
-
-            reward = norm.rvs(loc=self.arm_means[arm_means_idx,:][arm], scale=1.0)
-
-            algo.observe_reward(arm, reward)
-            rewards.append(reward)  
+        source = self.reward_source(arm_means_idx, "time", time_budget_ms)
+        algo.run_until(source)
                 
         history = algo.hist
         return history, self.arm_means[arm_means_idx,:], algo.total_means
@@ -145,18 +129,18 @@ class MAB_Experiment_runner:
         num_plots = len(histories)
         fig, axes = plt.subplots(num_plots, 1, figsize=(10, 5 * num_plots), gridspec_kw={'hspace': 0.5})
         
-        for i, history in enumerate(histories):
-            frequencies = [history.count(j) for j in range(self.num_arms)]
+        # Sort arms based on their means
+        sorted_indices = analysis.order_by_means(self.arm_means[arm_means_idx, :])
 
-            # Sort arms based on their means
-            sorted_indices = sorted(range(self.num_arms), key=lambda x: self.arm_means[arm_means_idx, x])
-            sorted_frequencies = [frequencies[j] for j in sorted_indices]
+        for i, history in enumerate(histories):
+            frequencies = analysis.pull_counts(history, self.num_arms)
+            sorted_frequencies = frequencies[sorted_indices]
 
             # Plotting the distribution of counts per arm in ascending order
             ax = axes[i] if num_plots > 1 else axes  # Handle single subplot case
             ax.bar(range(self.num_arms), sorted_frequencies, tick_label=[f'{j}' for j in sorted_indices])
             
-            title_suffix = f'{iterations} Iterations' if type == "baseline" else f'{time_range[histories.index(history)]}ms'
+            title_suffix = f'{iterations} Iterations' if type == "baseline" else f'{time_range[i]}ms'
             ax.set_title(f'{title_suffix}')
         
         fig.supxlabel('Arms (Sorted by True Arm Means)', ha='center', va='center')
@@ -167,31 +151,17 @@ class MAB_Experiment_runner:
 
     #Given a list of means, returns a list of equal size denoting the ranking of the means/arms at that index.
     def rank_means(self, means):
-        return [sorted(range(len(means)), key=lambda x: -means[x]).index(i) + 1 for i in range(len(means))]
+        return analysis.rank(means).tolist()
     
     
     #Given a list which is a ranking of arms (0 indexed), return how far off the true ranking is.
     def get_edit_distance(self, true_means, predicted_means):
-        #Make the rankings for each list
         arms_considered = 4 #Only consider the top 4 arms
-        indexes_top_arms = []
-        
-        true_means_ranked = self.rank_means(true_means)
-        predicted_means_ranked = self.rank_means(predicted_means)
-        # print(true_means_ranked)
-        # print(predicted_means_ranked)
-        for i in range(len(true_means_ranked)):
-            if true_means_ranked[i] < arms_considered:
-                indexes_top_arms.append(i)
-            if predicted_means_ranked[i] < arms_considered:
-                indexes_top_arms.append(i)
-        
-        #Get the edit distance between these two lists
-        return sum([1 for i in range(len(true_means_ranked)) if true_means_ranked[i] != predicted_means_ranked[i] and i in indexes_top_arms])
+        return int(metrics.edit_distance(true_means, predicted_means, arms_considered))
    
    #Given the true means and the mean of the predicted best arm, returns the regret relative to the true best arm.     
     def get_regret(self, true_means, best_predicted_arm_mean):
-        return abs(max(true_means) - best_predicted_arm_mean)
+        return float(metrics.regret(true_means, best_predicted_arm_mean))
     
  
         
@@ -199,220 +169,336 @@ class MAB_Experiment_runner:
     
 
     
-    def run_regret_and_edit_distance_experiment(self, algo_type="iteration", iterations=None, time_budget_ms=None, print_results=True):
+    def reward_source(self, arm_means_idx, algorithm, budget, repetition=0, means=None):
+        """
+        Returns a buffered Gaussian reward source (unit variance) for one run on one problem, on
+        the run's own stream. The means are those of row arm_means_idx unless given. An iteration
+        run draws exactly its budget up front; time-budgeted runs get the default block.
+        """
+        seed = self.seeds.cell(arm_means_idx, algorithm, budget, repetition).spawn(2)[0]
+        if means is None: means = self.arm_means[arm_means_idx,:]
+        block = max(1, min(RewardSource.BLOCK, int(budget))) if algorithm == "iteration" else None
+        return RewardSource(means, scale=1.0, seed=seed, block=block)
+
+    def synthetic_means(self, t):
+        """
+        Returns the means of synthetic problem t, drawn from its own stream instead of stored.
+        """
+        return sh.generate_arm_means(1, self.num_arms, seed=self.seeds.problem(t))[0]
+
+    def make_timer(self, pull_cost_ns, problem_idx, algorithm, budget, repetition=0):
+        """
+        Returns the time source for one run of a time budget experiment: real time, or a fresh
+        virtual timeline on the run's own stream if a pull cost or measured profile of costs is given.
+        """
+        if pull_cost_ns is None: return WALL_TIMER
+        return VirtualTimer(pull_cost_ns, seed=self.seeds.cell(problem_idx, algorithm, budget, repetition).spawn(2)[1])
+
+    def run_problem(self, t, algo_type="iteration", iterations=None, time_budget_ms=None, pull_cost_ns=None, repetition=0, true_means=None):
+        """
+        Runs one algorithm on problem t of arm_means (or on the given true means), on the run's
+        own random streams.
+
+        :return: (regret, edit distance), the edit distance is None for UCB.
+        """
+        if true_means is None: true_means = self.arm_means[t,:]
+        budget = iterations if algo_type == "iteration" else time_budget_ms
+        source = self.reward_source(t, algo_type, budget, repetition, true_means)
         match(algo_type):
             case "iteration":
-                regrets = []
-                edit_distances = []
-                for t in range(self.arm_means.shape[0]):
-                    algo = sh.SequentialHalvingAlg(True, self.num_arms, iterations)
-                    true_means = self.arm_means[t,:]
-                    #rewards = np.zeros(iterations)
-                    for i in range(iterations):
-                        arm = algo.choose_arm()
-                        reward = norm.rvs(loc=self.arm_means[t,:][arm], scale=1.0)
-                        algo.observe_reward(arm, reward)
-                    # print(true_means)
-                    # print(algo.total_means)
-                    # assert len(true_means) == len(algo.total_means)
-                    keys = algo.total_means.keys()
-                    max_val = -1
-                    for key in keys:
-                        if algo.total_means.get(key) > max_val:
-                            max_val = algo.total_means.get(key)
-                    # algo.reset()
-                    
-                    regrets.append(self.get_regret(true_means, max_val))
-                    
-                    edit_distances.append(self.get_edit_distance(true_means, algo.total_rewards))
-                
-                avg_regret = sum(regrets) / len(regrets)
-                std_regret = np.std(regrets)
-                avg_edit_distance = sum(edit_distances) / len(edit_distances)
-                std_edit_distance = np.std(edit_distances)
-            
+                algo = sh.SequentialHalvingAlg(True, self.num_arms, iterations)
+                summary = algo.run_until(source, iterations)
             case "time":
-                regrets = []
-                edit_distances = []
-                for t in range(self.arm_means.shape[0]):
-                    algo = sh.SequentialHalvingAlgTime_v1(time_budget_ms, True, self.num_arms)
-                    start_time = int(round(time.time() * 1000))                     
-                    true_means = self.arm_means[t,:]
-                    
-                    while int(round(time.time() * 1000)) - start_time < time_budget_ms:
-                        arm = algo.choose_arm()
-                        reward = norm.rvs(loc=self.arm_means[t,:][arm], scale=1.0)
-                        algo.observe_reward(arm, reward)
-                    
-                    
-                    keys = algo.total_means.keys()
-                    max_val = -1
-                    for key in keys:
-                        if algo.total_means.get(key) > max_val:
-                            max_val = algo.total_means.get(key)
-                            
-                    # print("\n******************")
-                    # print(true_means)
-                    # print("\n-----\n")
-                    # print(algo.current_arms)
-                    # print("\n-----\n")
-                    # print(algo.total_means)
-                    # print("******************\n")
-                    regrets.append(self.get_regret(true_means, max_val))
-                    
-                    edit_distances.append(self.get_edit_distance(true_means, algo.total_rewards))
-
-                    #print(t)
-                
-                avg_regret = sum(regrets) / len(regrets)
-                std_regret = np.std(regrets)
-                avg_edit_distance = sum(edit_distances) / len(edit_distances)
-                std_edit_distance = np.std(edit_distances)
+                algo = sh.SequentialHalvingAlgTime_v1(time_budget_ms, True, self.num_arms, timer=self.make_timer(pull_cost_ns, t, algo_type, time_budget_ms, repetition))
+                summary = algo.run_until(source)
             case "anytime":
-                regrets = []
-                edit_distances = []
-                for t in range(self.arm_means.shape[0]):
-                    algo = sh.SequentialHalvingAlgAnyTime_v1(time_budget_ms, True, self.num_arms)
-                    start_time = int(round(time.time() * 1000))                     
-                    true_means = self.arm_means[t,:]
-                    
-                    while int(round(time.time() * 1000)) <algo.stop_time:
-                        arm = algo.choose_arm()
-                        reward = norm.rvs(loc=self.arm_means[t,:][arm], scale=1.0)
-                        algo.observe_reward(arm, reward)
-                    
-                    
-                    keys = algo.total_means.keys()
-                    max_val = -1
-                    for key in keys:
-                        if algo.total_means.get(key) > max_val:
-                            max_val = algo.total_means.get(key)
-                            
-                    # print("\n******************")
-                    # print(true_means)
-                    # print("\n-----\n")
-                    # print(algo.current_arms)
-                    # print("\n-----\n")
-                    # print(algo.total_means)
-                    # print("******************\n")
-                    regrets.append(self.get_regret(true_means, max_val))
-                    
-                    edit_distances.append(self.get_edit_distance(true_means, algo.total_rewards))
-
-                    #print(t)
-                
-                avg_regret = sum(regrets) / len(regrets)
-                std_regret = np.std(regrets)
-                avg_edit_distance = sum(edit_distances) / len(edit_distances)
-                std_edit_distance = np.std(edit_distances)
+                algo = sh.SequentialHalvingAlgAnyTime_v1(time_budget_ms, True, self.num_arms, timer=self.make_timer(pull_cost_ns, t, algo_type, time_budget_ms, repetition))
+                summary = algo.run_until(source)
             case "ucb":
-                regrets = []
-                edit_distances = []
-                for t in range(self.arm_means.shape[0]):
-                    algo = sh.UCB1((1/math.sqrt(2)), num_arms, time_budget_ms)
-                    start_time = int(round(time.time() * 1000))                     
-                    true_means = self.arm_means[t,:]
-                    
-                    while int(round(time.time() * 1000)) <algo.stop_time:
-                        arm = algo.choose_arm()
-                        reward = norm.rvs(loc=self.arm_means[t,:][arm], scale=1.0)
-                        algo.observe_reward(arm, reward)
-                    
-                    
-                   
-                    max_val = np.max(algo.avg_rewards)
-                    
-                            
-                    # print("\n******************")
-                    # print(true_means)
-                    # print("\n-----\n")
-                    # print(algo.current_arms)
-                    # print("\n-----\n")
-                    # print(algo.total_means)
-                    # print("******************\n")
-                    regrets.append(self.get_regret(true_means, max_val))
-                    
-                    #edit_distances.append(self.get_edit_distance(true_means, algo.avg_rewards))
-
-                    #print(t)
-                
-                avg_regret = sum(regrets) / len(regrets)
-                std_regret = np.std(regrets)
-                avg_edit_distance = -1
-                std_edit_distance = -1
-                            
-                    
-  #  start_time = int(round(time.time() * 1000)) 
-#         while int(round(time.time() * 1000)) - start_time < time_budget_ms:
-#             arm = algo.choose_arm()
-
-#             reward = norm.rvs(loc=self.arm_means[arm_means_idx,:][arm], scale=1.0)
-
-#             algo.observe_reward(arm, reward)
-#             rewards.append(reward)  
-                
-#         history = algo.hist                  
-                    
+                algo = sh.UCB1((1/math.sqrt(2)), self.num_arms, time_budget_ms, mode="incremental", timer=self.make_timer(pull_cost_ns, t, algo_type, time_budget_ms, repetition))
+                summary = algo.run_until(source)
+
+        if algo_type == "ucb": return self.get_regret(true_means, summary.mean), None
+        return self.get_regret(true_means, summary.mean), self.get_edit_distance(true_means, algo.total_rewards)
+
+    def summarise_regret_and_edit_distance(self, results, algo_type, iterations=None, time_budget_ms=None, print_results=True):
+        """
+        Turns the (regret, edit distance) of every problem into the tuple the regret experiments return.
+        """
+        regrets = [regret for regret, _ in results]
+        regret_stats = RunningStats()
+        regret_stats.update_many(regrets)
+        if algo_type == "ucb":
+            edit_distances = []
+            edit_distance_stats = None
+        else:
+            edit_distances = [edit_distance for _, edit_distance in results]
+            edit_distance_stats = RunningStats()
+            edit_distance_stats.update_many(edit_distances)
+
+        if print_results: self.print_regret_and_edit_distance(regret_stats, edit_distance_stats, algo_type, iterations, time_budget_ms)
+
+        avg_edit_distance = edit_distance_stats.mean if edit_distance_stats else -1
+        std_edit_distance = edit_distance_stats.std() if edit_distance_stats else -1
+        return regrets, regret_stats.mean, regret_stats.std(), edit_distances, avg_edit_distance, std_edit_distance
+
+    def print_regret_and_edit_distance(self, regret_stats, edit_distance_stats, algo_type, iterations=None, time_budget_ms=None):
+        """
+        Prints the mean, standard deviation and 95% confidence interval of the regret and edit
+        distance (RunningStats, None for no edit distance), with quartiles if they were sketched.
+        """
+        print(f"Sequential Halving Algorithm - Version: {algo_type} Tested over {regret_stats.count} different distributions with {self.num_arms} arms.")
+        if algo_type == "iteration":
+            print(f"Number of iterations: {iterations}")
+        elif algo_type == "time" or algo_type == "anytime":
+            print(f"Time budget: {time_budget_ms}ms")
+        print(f"===============================")
+        for name, stats in (("regret", regret_stats), ("edit distance", edit_distance_stats)):
+            if stats is None:
+                print(f"Average {name}: -1")
+                print(f"Standard deviation of {name}: -1")
+                continue
+            print(f"Average {name}: {stats.mean}")
+            print(f"Standard deviation of {name}: {stats.std()}")
+            print(f"95% confidence interval of the average {name}: {stats.ci()}")
+            if stats.sketch is not None:
+                print(f"Quartiles of {name}: {[stats.quantile(q) for q in (0.25, 0.5, 0.75)]}")
+        print(f"===============================")
+
+    def run_regret_and_edit_distance_experiment(self, algo_type="iteration", iterations=None, time_budget_ms=None, print_results=True, pull_cost_ns=None, repetition=0, cache=None):
+        budget = iterations if algo_type == "iteration" else time_budget_ms
+        problems = range(self.arm_means.shape[0])
+        keys, results = self.cached_cells(cache, algo_type, budget, pull_cost_ns, repetition, problems)
+        for t in problems:
+            if t not in results: results[t] = self.run_problem(t, algo_type, iterations, time_budget_ms, pull_cost_ns, repetition)
+        if keys: cache.put_many((keys[t], results[t]) for t in keys if t in results)
+        results = [results[t] for t in problems]
+        return self.summarise_regret_and_edit_distance(results, algo_type, iterations, time_budget_ms, print_results)
+
+    def run_parallel_regret_and_edit_distance_experiment(self, algo_type="iteration", iterations=None, time_budget_ms=None, print_results=True, pull_cost_ns=None, repetition=0, workers=None):
+        """
+        Same experiment as run_regret_and_edit_distance_experiment, with the problems sharded over
+        a pool of worker processes. Every problem runs on the same random streams as in the serial
+        version, so the results are identical (for iteration budgets or virtual time).
+
+        :param workers: The amount of worker processes, all cores by default. The pool and the
+                        shared copy of arm_means are kept for later calls until shutdown_pool().
+        """
+        pool = self.worker_pool(workers)
+        num_problems = self.arm_means.shape[0]
+        # A few shards per worker, so that a slow shard does not leave the others idle.
+        tasks = parallel.shards(num_problems, 4 * self._pool_workers)
+        kwargs = dict(algo_type=algo_type, iterations=iterations, time_budget_ms=time_budget_ms, pull_cost_ns=pull_cost_ns, repetition=repetition)
+        futures = [pool.submit(_run_problem_shard, task, kwargs) for task in tasks]
+        results = [result for future in futures for result in future.result()]
+        return self.summarise_regret_and_edit_distance(results, algo_type, iterations, time_budget_ms, print_results)
+
+    def run_streaming_regret_and_edit_distance_experiment(self, num_problems, algo_type="iteration", iterations=None, time_budget_ms=None, print_results=True, pull_cost_ns=None, repetition=0, workers=None, shard_size=10000, quantiles=True):
+        """
+        Regret experiment over num_problems synthetic problems (see synthetic_means), which the
+        workers generate, run and fold into RunningStats shard by shard. Only the merged
+        statistics come back, so memory does not grow with num_problems.
+
+        :param shard_size: The amount of problems per task.
+        :param quantiles: Whether to sketch the quantiles of the regret and edit distance.
+        :return: (regret stats, edit distance stats) as RunningStats, the latter None for UCB.
+        """
+        pool = self.worker_pool(workers)
+        kwargs = dict(algo_type=algo_type, iterations=iterations, time_budget_ms=time_budget_ms, pull_cost_ns=pull_cost_ns, repetition=repetition)
+        futures = [pool.submit(_run_streaming_shard, range(start, min(start + shard_size, num_problems)), kwargs, quantiles)
+                   for start in range(0, num_problems, shard_size)]
+        regret_stats = RunningStats(quantiles)
+        edit_distance_stats = None if algo_type == "ucb" else RunningStats(quantiles)
+        # Merged in shard order, so that the floating point result does not depend on timing
+        for future in futures:
+            shard_regrets, shard_edit_distances = future.result()
+            regret_stats.merge(shard_regrets)
+            if edit_distance_stats is not None: edit_distance_stats.merge(shard_edit_distances)
+
+        if print_results: self.print_regret_and_edit_distance(regret_stats, edit_distance_stats, algo_type, iterations, time_budget_ms)
+        return regret_stats, edit_distance_stats
+
+    def worker_pool(self, workers=None):
+        """
+        Returns the runner's pool of worker processes, starting it (and sharing arm_means with it)
+        on first use or when a different amount of workers is asked for.
+        """
+        workers = parallel.worker_count(workers)
+        pool = getattr(self, "_pool", None)
+        if pool is not None and self._pool_workers == workers and self._shared_means.array is not None and np.array_equal(self._shared_means.array, self.arm_means):
+            return pool
+        self.shutdown_pool()
+        self._shared_means = parallel.SharedArray(self.arm_means)
+        self._pool = parallel.worker_pool(workers, _init_problem_worker, (self.num_arms, self.seeds.root, self._shared_means.spec))
+        self._pool_workers = workers
+        # Also shut down when the runner is collected or the interpreter exits
+        self._pool_finalizer = weakref.finalize(self, _shutdown_pool, self._pool, self._shared_means)
+        return self._pool
+
+    def shutdown_pool(self) -> None:
+        """
+        Stops the worker processes and frees the shared copy of arm_means.
+        """
+        if getattr(self, "_pool", None) is None: return
+        self._pool_finalizer()
+        self._pool = None
+
+
+    def run_batched_regret_and_edit_distance_experiment(self, algo_type="iteration", iterations=None, print_results=True, repetition=0):
+        """
+        Same experiment as run_regret_and_edit_distance_experiment, but every problem in arm_means
+        is advanced in lockstep by a batched algorithm. All algorithm types use an iteration budget.
+        """
+        num_problems = self.arm_means.shape[0]
+        match(algo_type):
+            case "iteration":
+                algo = bm.BatchedSequentialHalvingAlg(num_problems, self.num_arms, iterations)
+            case "anytime":
+                algo = bm.BatchedSequentialHalvingAlgAnyTime_v1(num_problems, self.num_arms)
+            case "ucb":
+                algo = bm.BatchedUCB1((1/math.sqrt(2)), num_problems, self.num_arms)
+
+        bm.run_batched(algo, self.arm_means, iterations, BatchedRewardSource(self.arm_means, scale=1.0, seed=self.seeds.batch(algo_type, iterations, repetition)))
+
+        best_means = algo.total_means[algo.rows, algo.recommend()]
+        regrets = metrics.regret(self.arm_means, best_means).tolist()
+        avg_regret = sum(regrets) / len(regrets)
+        std_regret = np.std(regrets)
+
+        if algo_type == "ucb":
+            edit_distances = []
+            avg_edit_distance = -1
+            std_edit_distance = -1
+        else:
+            edit_distances = metrics.edit_distance(self.arm_means, algo.total_rewards).tolist()
+            avg_edit_distance = sum(edit_distances) / len(edit_distances)
+            std_edit_distance = np.std(edit_distances)
+        other_metrics = metrics.evaluate(self.arm_means, algo.total_means, ("simple_regret", "correct_identification", "top_m_overlap", "kendall_tau"))
+
         if print_results:
-            print(f"Sequential Halving Algorithm - Version: {algo_type} Tested over {self.arm_means.shape[0]} different distributions with {num_arms} arms.")
-            if algo_type == "iteration":
-                print(f"Number of iterations: {iterations}")
-            elif algo == "time" or algo == "anytime":
-                print(f"Time budget: {time_budget_ms}ms")
+            print(f"Batched {algo_type} - Tested over {num_problems} different distributions with {self.num_arms} arms.")
+            print(f"Number of iterations: {iterations}")
             print(f"===============================")
             print(f"Average regret: {avg_regret}")
             print(f"Standard deviation of regret: {std_regret}")
             print(f"Average edit distance: {avg_edit_distance}")
             print(f"Standard deviation of edit distance: {std_edit_distance}")
+            for name, values in other_metrics.items():
+                print(f"Average {name.replace('_', ' ')}: {np.nanmean(values)}")
             print(f"===============================")
-            
-            
-            
+
         return regrets, avg_regret, std_regret, edit_distances, avg_edit_distance, std_edit_distance
-                
-                
-        
 
 
-    def make_csv_edit_regret_experiment(self, algo_type="iteration", iteration_range=None, time_range=None):
-        avg_regret_list = []
-        std_regret_list = []
-        avg_edit_distance_list = []
-        std_edit_distance_list = []
-        
-        if algo_type == "iteration":
-            for r in iteration_range:
-                regrets, avg_regret, std_regret, edit_distances, avg_edit_distance, std_edit_distance = self.run_regret_and_edit_distance_experiment(algo_type, iterations=r, print_results=False)
-                avg_regret_list.append(avg_regret)
-                std_regret_list.append(std_regret)
-                avg_edit_distance_list.append(avg_edit_distance)
-                std_edit_distance_list.append(std_edit_distance)
-        elif algo_type == "time":  
-            for r in time_range:
-                regrets, avg_regret, std_regret, edit_distances, avg_edit_distance, std_edit_distance = self.run_regret_and_edit_distance_experiment(algo_type, time_budget_ms=r, print_results=False)
-                avg_regret_list.append(avg_regret)
-                std_regret_list.append(std_regret)
-                avg_edit_distance_list.append(avg_edit_distance)
-                std_edit_distance_list.append(std_edit_distance)
-        elif algo_type == "anytime":
-            for r in time_range:
-                regrets, avg_regret, std_regret, edit_distances, avg_edit_distance, std_edit_distance = self.run_regret_and_edit_distance_experiment(algo_type, time_budget_ms=r, print_results=False)
-                avg_regret_list.append(avg_regret)
-                std_regret_list.append(std_regret)
-                avg_edit_distance_list.append(avg_edit_distance)
-                std_edit_distance_list.append(std_edit_distance)
-        elif algo_type == "ucb":
-            for r in time_range:
-                regrets, avg_regret, std_regret, edit_distances, avg_edit_distance, std_edit_distance = self.run_regret_and_edit_distance_experiment(algo_type, time_budget_ms=r, print_results=False)
-                avg_regret_list.append(avg_regret)
-                std_regret_list.append(std_regret)
-                avg_edit_distance_list.append(avg_edit_distance)
-                std_edit_distance_list.append(std_edit_distance)
-                
-                
-                
-            
+
+
+
+    def experiment_key(self, pull_cost_ns=None):
+        """
+        Returns what identifies this runner's experiments in a sweep log: the arms, a checksum of
+        arm_means, the root seed and the modelled pull cost.
+        """
+        return {"num_arms": self.num_arms, "num_problems": self.arm_means.shape[0],
+                "means": zlib.crc32(np.ascontiguousarray(self.arm_means).tobytes()),
+                "seed": str(self.seeds.root.entropy), "spawn_key": list(self.seeds.root.spawn_key),
+                "pull_cost_ns": _cost_key(pull_cost_ns)}
+
+    def algorithm_spec(self, algo_type):
+        """
+        Returns the algorithm class and parameters run_problem uses for algo_type.
+        """
+        match(algo_type):
+            case "iteration":
+                return {"class": "SequentialHalvingAlg", "k": self.num_arms, "ordered_halving": True}
+            case "time":
+                return {"class": "SequentialHalvingAlgTime_v1", "k": self.num_arms, "ordered_halving": True}
+            case "anytime":
+                return {"class": "SequentialHalvingAlgAnyTime_v1", "k": self.num_arms, "ordered_halving": True}
+            case "ucb":
+                return {"class": "UCB1", "C": 1/math.sqrt(2), "numarms": self.num_arms, "mode": "incremental"}
+
+    def cached_cells(self, cache, algo_type, budget, pull_cost_ns, repetition, problems):
+        """
+        Looks the given problems of one (algo_type, budget, repetition) up in a CellCache. Only
+        reproducible cells are cached: iteration budgets, or time budgets on virtual time.
+
+        :return: ({problem: cache key} of the cacheable problems, {problem: result} of the hits)
+        """
+        if cache is None or (algo_type != "iteration" and pull_cost_ns is None): return {}, {}
+        keys = {}
+        for t in problems:
+            seed = self.seeds.cell(t, algo_type, budget, repetition)
+            keys[t] = cache.key(self.arm_means[t,:], algorithm=self.algorithm_spec(algo_type), budget=budget,
+                                seed=[str(seed.entropy), list(seed.spawn_key)], pull_cost_ns=_cost_key(pull_cost_ns))
+        found = cache.get_many(keys.values())
+        return keys, {t: tuple(found[key]) for t, key in keys.items() if key in found}
+
+    def open_cache(self, path, max_bytes=256 * 2**20):
+        """
+        Returns a CellCache whose code version covers every module a cell runs: the algorithms and
+        their pull history, the reward and timer streams, the regret and edit distance metrics and
+        this runner, so editing any of them makes earlier results miss.
+        """
+        modules = ["SequentialHalvingMAB", "history", "rewards", "clocks", "seeding", "metrics", "analysis", type(self).__module__]
+        return CellCache(path, max_bytes, version=code_version(modules))
+
+    def run_sweep(self, algo_type, budgets, log_path, pull_cost_ns=None, repetition=0, workers=None, shard_size=None, cache=None):
+        """
+        Runs every (budget, shard of problems) cell of a sweep on the worker pool, persisting each
+        finished cell to an append-only log (see sweep.SweepLog). Cells already in the log are
+        not run again, so an interrupted sweep resumes where it stopped.
+
+        :param budgets: The iteration budgets (algo_type "iteration") or time budgets in ms.
+        :param log_path: The results log of the sweep.
+        :param shard_size: Problems per task, a few tasks per worker by default.
+        :param workers: Worker processes, all cores by default for iteration budgets and virtual
+                        time (pull_cost_ns), but one for wall-clock budgets, where runs competing
+                        for the CPU would change the pulls every budget buys.
+        :param cache: Optional CellCache, consulted for the cells missing from the log.
+        :return: {budget: [(regret, edit distance) of every problem, in problem order]}
+        """
+        if workers is None and algo_type != "iteration" and pull_cost_ns is None: workers = 1
+        budgets = [_plain(budget) for budget in budgets] #NumPy scalars are not JSON-able log and cache keys
+        log = sweep.SweepLog(log_path, self.experiment_key(pull_cost_ns))
+        num_problems = self.arm_means.shape[0]
+        tasks = {}
+        keys = {}
+        for budget in budgets:
+            missing = log.missing(algo_type, budget, repetition, num_problems)
+            keys[budget], hits = self.cached_cells(cache, algo_type, budget, pull_cost_ns, repetition, missing)
+            if hits:
+                log.append(algo_type, budget, repetition, list(hits), list(hits.values()))
+                missing = [t for t in missing if t not in hits]
+            if not missing: continue
+            pool = self.worker_pool(workers)
+            size = shard_size or max(1, math.ceil(num_problems / (4 * self._pool_workers)))
+            kwargs = dict(algo_type=algo_type, pull_cost_ns=pull_cost_ns, repetition=repetition)
+            kwargs["iterations" if algo_type == "iteration" else "time_budget_ms"] = budget
+            for start in range(0, len(missing), size):
+                problems = missing[start:start + size]
+                tasks[pool.submit(_run_problem_shard, problems, kwargs)] = (budget, problems)
+
+        for future in as_completed(tasks):
+            budget, problems = tasks[future]
+            results = future.result()
+            log.append(algo_type, budget, repetition, problems, results)
+            if keys[budget]: cache.put_many((keys[budget][t], result) for t, result in zip(problems, results))
+
+        return {budget: log.results(algo_type, budget, repetition, num_problems) for budget in budgets}
+
+    def make_csv_edit_regret_experiment(self, algo_type="iteration", iteration_range=None, time_range=None, pull_cost_ns=None, workers=None, log_path=None, cache=None):
+        """
+        Writes the average and standard deviation of the regret and edit distance for every budget
+        of a sweep to a CSV. The sweep runs on a worker pool and is logged to log_path (next to the
+        CSV by default), so running it again after an interruption only computes what is missing.
+        With a CellCache, cells computed by earlier sweeps are reused as well. Wall-clock sweeps
+        use one worker unless told otherwise, see run_sweep.
+        """
+        budgets = iteration_range if algo_type == "iteration" else time_range
         filename = f"{algo_type}_regret_edit_distance.csv"
+        if log_path is None: log_path = f"{algo_type}_regret_edit_distance.log"
+        results = self.run_sweep(algo_type, budgets, log_path, pull_cost_ns=pull_cost_ns, workers=workers, cache=cache)
+
         with open(filename, 'w', newline='') as f:
             writer = csv.writer(f)
             
@@ -420,18 +506,57 @@ class MAB_Experiment_runner:
             writer.writerow(["Index", "Avg Regret", "Std Regret", "Avg Edit Distance", "Std Edit Distance"])
             
             # Write data rows
-            if algo_type == "iteration":
-                for i, r in enumerate(iteration_range):
-                    writer.writerow([r, avg_regret_list[i], std_regret_list[i], avg_edit_distance_list[i], std_edit_distance_list[i]])
-            elif algo_type == "time" or algo_type == "anytime" or algo_type == "ucb":
-                for i, r in enumerate(time_range):
-                    writer.writerow([r, avg_regret_list[i], std_regret_list[i], avg_edit_distance_list[i], std_edit_distance_list[i]])
+            for r in budgets:
+                regrets, avg_regret, std_regret, edit_distances, avg_edit_distance, std_edit_distance = self.summarise_regret_and_edit_distance(results[r], algo_type, print_results=False)
+                writer.writerow([r, avg_regret, std_regret, avg_edit_distance, std_edit_distance])
         
         print(f"CSV file created for {algo_type} experiment.")
         return filename
 
 
 
+_worker_runner = None #The runner of a pool worker process, on the shared arm_means
+
+
+def _cost_key(pull_cost_ns):
+    # A measured profile of pull costs is identified by a checksum
+    if pull_cost_ns is not None and np.ndim(pull_cost_ns) > 0:
+        return f"profile:{zlib.crc32(np.asarray(pull_cost_ns, dtype=np.int64).tobytes())}"
+    return _plain(pull_cost_ns)
+
+
+def _plain(value):
+    # NumPy scalars (e.g. from np.arange budgets) as the Python int or float they hold
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _shutdown_pool(pool, shared_means):
+    pool.shutdown()
+    shared_means.close()
+
+
+def _init_problem_worker(num_arms, seed, means_spec):
+    global _worker_runner
+    _worker_runner = MAB_Experiment_runner(num_arms, 0, seed)
+    _worker_runner.arm_means = parallel.attach(means_spec)
+    _worker_runner.means_amt = _worker_runner.arm_means.shape[0]
+
+
+def _run_problem_shard(problems, kwargs):
+    return [_worker_runner.run_problem(t, **kwargs) for t in problems]
+
+
+def _run_streaming_shard(problems, kwargs, quantiles):
+    regret_stats = RunningStats(quantiles)
+    edit_distance_stats = RunningStats(quantiles)
+    for t in problems:
+        regret, edit_distance = _worker_runner.run_problem(t, true_means=_worker_runner.synthetic_means(t), **kwargs)
+        regret_stats.update(regret)
+        if edit_distance is not None: edit_distance_stats.update(edit_distance)
+    return regret_stats, edit_distance_stats
+
+
+
 #Experiments to run (write implementation down in detail):
 """
 1. Ranking accuracy (average edit distance(?)) over different iteration/time budgets ()
@@ -1,47 +1,317 @@
+import heapq
 import math
 import time
+from array import array
+from dataclasses import dataclass
+from functools import lru_cache
 import numpy as np
+from clocks import WALL_TIMER
+from history import PullHistory
 
-#np.random.seed(2079)    # fix seed to make everything below reproducible
 arms = 10      # number of arms per MAB problem
 num_mab_problems = 200
 #iteration_budget = 1000
 
-# Matrix of means, where the i'th row contains the means of all arms for the
-# i'th MAB problem
-arm_means = np.random.normal(loc=0.0, scale=1.0, size=(num_mab_problems, arms))
+
+def generate_arm_means(num_problems=num_mab_problems, k=arms, seed=None) -> np.ndarray:
+  """
+  Matrix of means, where the i'th row contains the means of all arms for the i'th MAB problem.
+
+  :param seed: Seed (int or SeedSequence) of the draw, see seeding.ExperimentSeeds.means.
+  """
+  return np.random.default_rng(seed).normal(loc=0.0, scale=1.0, size=(num_problems, k))
+
+
+class BestArm:
+  """
+  Incrementally maintained best arm, by observed mean and by visits, so the arm to recommend can
+  be asked for at any interruption point of a search in O(1).
+
+  Visits only grow, so the most visited arm stays exact with one comparison per observation. A
+  mean can drop, but only a drop of the best arm's own mean can change the best arm to one that
+  was not observed; then the best arm is recomputed (O(k)) on the next query. Ties go to the
+  lowest index, as with np.argmax, and arms that were never pulled are not recommended by mean.
+  """
+
+  __slots__ = ("_means", "_visits", "means", "visits", "by_mean", "best_mean", "by_visits", "stale")
+
+  def __init__(self, means, visits):
+    """
+    :param means: The `array('d')` of observed means, updated before every observe call.
+    :param visits: The `array('q')` of visits, same.
+    """
+    self._means = means
+    self._visits = visits
+    self.means = np.frombuffer(means, dtype=np.float64)
+    self.visits = np.frombuffer(visits, dtype=np.int64)
+    self.reset()
+
+  def reset(self) -> None:
+    self.by_mean = -1 #No arm pulled yet
+    self.best_mean = -math.inf
+    self.by_visits = 0
+    self.stale = False
+
+  def observe(self, arm: int) -> None:
+    """
+    :param arm: The arm whose mean and visits were just updated.
+    """
+    mean = self._means[arm]
+    best = self.by_mean
+    if arm == best:
+      if mean < self.best_mean: self.stale = True
+      else: self.best_mean = mean
+    elif not self.stale and (mean > self.best_mean or (mean == self.best_mean and arm < best)):
+      self.by_mean = arm
+      self.best_mean = mean
+
+    n = self._visits[arm]
+    best = self.by_visits
+    if n > self._visits[best] or (n == self._visits[best] and arm < best): self.by_visits = arm
+
+  def observe_many(self, played) -> None:
+    """
+    :param played: The distinct arms (ascending) whose means and visits were just updated.
+    """
+    best = self.by_mean
+    if best >= 0 and not self.stale:
+      if self._means[best] < self.best_mean: self.stale = True
+      else: self.best_mean = self._means[best]
+    if not self.stale:
+      arm = int(played[np.argmax(self.means[played])])
+      mean = self._means[arm]
+      if mean > self.best_mean or (mean == self.best_mean and arm < best):
+        self.by_mean = arm
+        self.best_mean = mean
+
+    arm = int(played[np.argmax(self.visits[played])])
+    n = self._visits[arm]
+    best = self.by_visits
+    if n > self._visits[best] or (n == self._visits[best] and arm < best): self.by_visits = arm
+
+  def arm(self, by="mean") -> int:
+    """
+    :param by: "mean" for the pulled arm with the highest observed mean, "visits" for the most
+               pulled arm.
+    :return: The best arm, arm 0 before any pull.
+    """
+    if by == "visits": return self.by_visits
+    if by != "mean": raise ValueError(f"Unknown recommendation criterion: {by}")
+    if self.stale:
+      means = np.where(self.visits > 0, self.means, -np.inf)
+      self.by_mean = int(np.argmax(means))
+      self.best_mean = self._means[self.by_mean]
+      self.stale = False
+    return max(self.by_mean, 0)
+
+
+class ArmStatistics:
+  """
+  Per-arm statistics shared by the sequential halving algorithms.
+
+  Visits, reward sums, means and the ordered set of surviving arms live in preallocated
+  `array` buffers so a pull only does O(1) scalar indexing without allocating anything.
+  `visits`, `total_rewards`, `total_means` and `survivor_view` are zero-copy NumPy views over
+  the same memory, used for the vectorised work (halving, reporting). `best` tracks the arm to
+  recommend.
+  """
+
+  __slots__ = ("k", "ordered", "num_survivors", "survivors", "_visits", "_rewards", "_means",
+               "visits", "total_rewards", "total_means", "survivor_view", "best")
+
+  def __init__(self, k: int, ordered: bool = True):
+    """
+    :param k: The number of arms.
+    :param ordered: Whether halving orders the surviving arms best first (O(k log k)) or keeps
+                    them in their previous order (O(k)).
+    """
+    self.k = k
+    self.ordered = ordered
+    self._visits = array('q', bytes(8 * k))
+    self._rewards = array('d', bytes(8 * k))
+    self._means = array('d', bytes(8 * k))
+    self.survivors = array('q', range(k)) #Surviving arms, best first after every halving
+    self.num_survivors = k
+
+    self.visits = np.frombuffer(self._visits, dtype=np.int64)
+    self.total_rewards = np.frombuffer(self._rewards, dtype=np.float64)
+    self.total_means = np.frombuffer(self._means, dtype=np.float64)
+    self.survivor_view = np.frombuffer(self.survivors, dtype=np.int64)
+    self.best = BestArm(self._means, self._visits)
+
+  def reset(self) -> None:
+    """
+    Reset all statistics in place and make every arm a survivor again.
+    """
+    self.visits[:] = 0
+    self.total_rewards[:] = 0.0
+    self.total_means[:] = 0.0
+    self.best.reset()
+    self.reset_survivors()
+
+  def reset_survivors(self) -> None:
+    """
+    Make every arm a survivor again (in original index order), keeping the statistics.
+    """
+    self.survivor_view[:] = np.arange(self.k)
+    self.num_survivors = self.k
+
+  def load(self, visits, total_rewards) -> None:
+    """
+    Replace the statistics, e.g. with those of a previous search of the same arms.
+
+    :param visits: The visits of every arm.
+    :param total_rewards: The reward sum of every arm.
+    """
+    self.visits[:] = visits
+    self.total_rewards[:] = total_rewards
+    with np.errstate(invalid="ignore", divide="ignore"):
+      self.total_means[:] = np.where(self.visits > 0, self.total_rewards / self.visits, 0.0)
+    self.best.reset()
+    self.best.by_visits = int(np.argmax(self.visits))
+    self.best.stale = True
+
+  def observe(self, arm: int, reward: float) -> None:
+    """
+    :param arm: Index (starting at 0) of the arm we played.
+    :param reward: The reward we received.
+    """
+    n = self._visits[arm] + 1
+    self._visits[arm] = n
+    total = self._rewards[arm] + reward
+    self._rewards[arm] = total
+    self._means[arm] = total / n
+    self.best.observe(arm)
+
+  def observe_many(self, arms, rewards, round_robin=False) -> None:
+    """
+    Bulk version of observe: arms may repeat within the block.
+
+    :param arms: Indices of the arms we played, in order.
+    :param rewards: The rewards we received, aligned with arms.
+    :param round_robin: Whether arms is a round robin over the survivors, as choose_arms returns.
+                        Such a block of at most num_survivors arms has no repeats.
+    """
+    if round_robin and len(arms) <= self.num_survivors:
+      #Distinct arms: plain fancy indexing, no unique/bincount
+      self.visits[arms] += 1
+      self.total_rewards[arms] += rewards
+      self.total_means[arms] = self.total_rewards[arms] / self.visits[arms]
+      self.best.observe_many(np.sort(arms))
+      return
+    played, inverse = np.unique(arms, return_inverse=True)
+    self.visits[played] += np.bincount(inverse)
+    self.total_rewards[played] += np.bincount(inverse, weights=rewards)
+    self.total_means[played] = self.total_rewards[played] / self.visits[played]
+    self.best.observe_many(played)
+
+  def halve(self, keep: int) -> None:
+    """
+    Keep the `keep` surviving arms with the highest means. They are picked with an O(k) partial
+    selection where ties go to the arm that comes first in the current survivor order; if the
+    statistics are ordered, the kept arms are then sorted best first (stable).
+
+    :param keep: Number of arms that survive the halving.
+    """
+    alive = self.survivor_view[:self.num_survivors]
+    means = self.total_means[alive]
+    kept = top_positions(means, keep)
+    if self.ordered: kept = kept[np.argsort(-means[kept], kind="stable")]
+    alive[:keep] = alive[kept]
+    self.num_survivors = keep
+
+
+def top_positions(values, keep) -> np.ndarray:
+  """
+  Positions of the `keep` largest values in O(len(values)), in ascending position order. Values
+  tied at the cut-off are taken from the front, matching a stable descending sort. For a 2D array
+  every row is selected from, giving a (rows, keep) array.
+  """
+  n = values.shape[-1]
+  if values.ndim == 2:
+    if keep >= n: return np.tile(np.arange(n), (values.shape[0], 1))
+    threshold = np.partition(values, n - keep, axis=1)[:, n - keep, None]
+    mask = values > threshold
+    ties = values == threshold
+    needed = keep - np.count_nonzero(mask, axis=1)
+    mask |= ties & (np.cumsum(ties, axis=1) <= needed[:, None])
+    return np.nonzero(mask)[1].reshape(-1, keep)
+  if keep >= n: return np.arange(n)
+  threshold = np.partition(values, n - keep)[n - keep]
+  mask = values > threshold
+  ties = np.flatnonzero(values == threshold)[:keep - np.count_nonzero(mask)]
+  mask[ties] = True
+  return np.flatnonzero(mask)
+
+
+@dataclass(frozen=True)
+class SequentialHalvingSchedule:
+  """
+  The phases SequentialHalvingAlg goes through for k arms and an iteration budget.
+
+  Phase 0 is round_pulls round-robin pulls over all arms; every later phase is the halving pull
+  followed by round_pulls more. If the budget does not split evenly over the ceil(log2(k)) rounds
+  the algorithm never halves (round_pulls is None) and the schedule is a single phase.
+  """
+  k: int
+  budget: int
+  round_pulls: int | None
+  num_arms: tuple #Surviving arms in every phase
+  pulls: tuple #Pulls in every phase
+  offsets: tuple #Iteration at which every phase starts, followed by the budget
+  samples_per_arm: tuple #Pulls every surviving arm gets at least, per phase
+
+
+@lru_cache(maxsize=1024)
+def sequential_halving_schedule(k, budget) -> SequentialHalvingSchedule:
+  """
+  Returns the (shared, immutable) phase schedule for k arms and an iteration budget.
+  """
+  round_time = budget/math.ceil(math.log2(k))
+  round_pulls = int(round_time) if float(round_time).is_integer() else None
+
+  num_arms, pulls, offsets = [], [], [0]
+  arms, size = k, budget if round_pulls is None else round_pulls
+  while offsets[-1] < budget:
+    num_arms.append(arms)
+    pulls.append(min(size, budget - offsets[-1]))
+    offsets.append(offsets[-1] + pulls[-1])
+    arms = math.ceil(arms/2)
+    size = budget if round_pulls is None else round_pulls + 1
+
+  return SequentialHalvingSchedule(k, budget, round_pulls, tuple(num_arms), tuple(pulls), tuple(offsets),
+                                   tuple(p // n for p, n in zip(pulls, num_arms)))
 
 
 class SequentialHalvingAlg:
   """
   Baseline sequential halving algorithm using a discrete iteration budget (as per Karnin et al., 2013).
   """
-  
-  def __init__(self,return_hist=False, k=10, time_steps_per_problem=1000):
-      self.original_indices = {index: 0 for index, arm in enumerate(range(k))}  # Map arm to its original index
-      self.current_arms = {index: 0 for index, arm in enumerate(range(k))}
-      self.current_arm = self.current_arms.get(0) #Keeping track of the current arm to pull
-      self.current_rewards = {index: 0 for index, arm in enumerate(range(k))}  # Map arm to its original index
-      self.visits = {index: 0 for index, arm in enumerate(range(k))}  #The amount of times that the algorithm has pulled each arm
-      self.total_rewards =  {index: 0 for index, arm in enumerate(range(k))}  #The total rewards that the algorithm has observed for each arm
+
+  def __init__(self,return_hist=False, k=10, time_steps_per_problem=1000, ordered_halving=True):
+      self.stats = ArmStatistics(k, ordered_halving) #Visits, rewards, means and surviving arms
+      self.visits = self.stats.visits  #The amount of times that the algorithm has pulled each arm
+      self.total_rewards = self.stats.total_rewards  #The total rewards that the algorithm has observed for each arm
+      self.total_means = self.stats.total_means #The mean reward that the algorithm has observed for each arm
+      self.current_arm = 0 #Keeping track of the current arm to pull
 
       self.considered_arms_amt = k #The amount of arms that the algorithm is currently considering
-      self.total_means = {index: 0 for index, arm in enumerate(range(k))} #The total rewards that the algorithm has observed for each arm
-      self.considered_arms_amt = k #The amount of arms that the algorithm is currently considering
-      self.time_steps_per_problem = time_steps_per_problem 
+      self.time_steps_per_problem = time_steps_per_problem
+      self.schedule = sequential_halving_schedule(k, time_steps_per_problem) #Phase plan, shared by all instances with the same k and budget
+      self.phase = 0
       self.sample_count_per_arm = self.get_dist_per_arm(k) #Amount of times by which each arm should be sampled (as per Karnin et al algorithm).
-      self.current_iteration = 0 
-      
+      self.current_iteration = 0
+
       self.budget_left = time_steps_per_problem
       self.current_round = 1
       self.return_hist = return_hist
-      self.hist = [] #Stores history of arms pulled
+      self.hist = PullHistory(k) #Stores history of arms pulled
       self.k = k
       self.current_arm_idx = 0
-      
+
       self.phases = math.ceil(math.log2(k))
       self.round_time = time_steps_per_problem/self.phases
-      
+
 
 
   """
@@ -49,209 +319,196 @@ class SequentialHalvingAlg:
   """
   def get_dist_per_arm(self, num_arms):
       return math.floor(self.time_steps_per_problem/(num_arms*math.ceil(math.log2(num_arms))))
-    
-  
+
+
   def reset(self) -> None:
-    self.current_arms = range(self.k)
-    self.current_arm = self.current_arms.get(0) #Keeping track of the current arm to pull
-    self.current_rewards = [0] * self.k
-    self.visits = [0] * self.k 
-    self.total_rewards = [0] * self.k 
+    self.stats.reset()
+    self.current_arm = 0 #Keeping track of the current arm to pull
+    self.current_arm_idx = 0
+    self.current_iteration = 0
+    self.phase = 0
     self.considered_arms_amt = self.k
     self.sample_count_per_arm = self.get_dist_per_arm(self.k)
     self.budget_left = self.time_steps_per_problem
     self.current_round = 1
-    self.hist = [] #Stores history of arms pulled
-    self.budget_left = self.time_steps_per_problem
-  
-  def sort_arms(self, arms):
-      # Pair each arm with its corresponding reward, sort the pairs, and extract the arms
-        # self.current_arms, self.current_rewards = zip(*sorted(zip(self.current_arms, self.current_rewards), key=lambda x: x[1], reverse=True))
-        # self.current_arms = list(self.current_arms)
-        # self.current_rewards = list(self.current_rewards)
-      sorted_dict = dict(sorted(arms.items(), key=lambda item: item[1], reverse=True))
-      return sorted_dict
-    
-  def halve_arms(self, arms):
-      #print('here')
-      new_dict = {}
-      keys = list(arms.keys())
-      #print('len keys: ', len(keys))
-      #print('considered arms amount: ', self.considered_arms_amt)
-      # print('Amount after halving: ', (math.ceil(len(keys) / (self.considered_arms_amt/2))))
-      #ran = math.ceil(len(keys) / (self.considered_arms_amt/2))
-      ran = math.ceil(len(keys)/2)
-      #print('Amount after halving: ', ran)
-      for i in range(ran):
-          new_dict[keys[i]] = arms[keys[i]]
-      return new_dict
-  
-    
-  
+    self.hist = PullHistory(self.k) #Stores history of arms pulled
+
   def choose_arm(self) -> int:
-    #print(f"current_arm: {self.current_arm} current index: {self.current_arms.index(self.current_arm)} current_iteration: {self.current_iteration} considered_arms_amt: {self.considered_arms_amt} current_round: {self.current_round} budget_left: {self.budget_left} sample_count_per_arm: {self.sample_count_per_arm} arms left: {len(self.current_arms)}")
-    if(self.considered_arms_amt < 1): return self.current_arm
-    
-    
-    if self.current_iteration == self.round_time:
+    stats = self.stats
+    if self.current_iteration == self.schedule.round_pulls:
       self.current_iteration = 0
-      
-      
-      #Check to see if we have used every arm the amount of times we should have
-
-      #If we have, we halve the amount of considered arms based on rewards and reset the current arm to the first arm in the list
-      
-      # # Pair each arm with its corresponding reward, sort the pairs, and extract the arms
-      
-      self.budget_left = self.budget_left/2 
-        # Pair each arm with its corresponding reward, sort the pairs, and extract the arms
-      # print("*************************")
-      # print("before sorting: ", self.current_arms)
-      self.current_arms = self.sort_arms(self.current_arms)
-      # print("after sorting: ", self.current_arms)
-      self.current_arms = self.halve_arms(self.current_arms)
-      # print("after halving: ", self.current_arms)
-      # print("*************************\n\n")
-      self.considered_arms_amt = len(self.current_arms)
-        
-        # budget_left = self.budget_left
-      if self.considered_arms_amt == 1:
-        self.sample_count_per_arm = self.budget_left
-      else:
-        self.sample_count_per_arm = self.get_dist_per_arm(self.considered_arms_amt)
-        
-      self.current_arm_idx = 0
-      
-      if len(self.current_arms) > 1: self.current_arm_idx = self.current_arm_idx + 1
-        
-      self.current_arm = list(self.current_arms.keys())[0]
+
+      #We have used every arm the amount of times we should have, so we halve the amount of
+      #considered arms based on rewards and restart at the best arm
+      stats.halve(math.ceil(stats.num_survivors/2))
+      self.considered_arms_amt = stats.num_survivors
+
+      self.phase = self.phase + 1
+      if self.phase < len(self.schedule.pulls):
+        self.budget_left = self.time_steps_per_problem - self.schedule.offsets[self.phase]
+        self.sample_count_per_arm = self.schedule.samples_per_arm[self.phase]
+
       self.current_arm_idx = 0
-      
-      if self.return_hist: self.hist.append(self.current_arm)
-      
+      self.current_arm = stats.survivors[0]
+
+      if self.return_hist:
+        self.hist.new_phase(stats.survivor_view[:stats.num_survivors])
+        self.hist.append(self.current_arm)
+
       return self.current_arm
-    
-    
-    
-    if self.current_arm_idx == len(self.current_arms) - 1:
-      self.current_arm_idx = 0
-    else:
-      self.current_arm_idx = self.current_arm_idx + 1
-    
-    self.current_arm =  list(self.current_arms.keys())[self.current_arm_idx] 
-      
-      
+
+    idx = self.current_arm_idx + 1
+    if idx >= stats.num_survivors: idx = 0
+    self.current_arm_idx = idx
+    self.current_arm = stats.survivors[idx]
+
     if self.return_hist: self.hist.append(self.current_arm)
     self.current_iteration = self.current_iteration + 1
     return self.current_arm
-  
-  
+
+  def choose_arms(self, n) -> np.ndarray:
+    """
+    Bulk version of choose_arm. Within a phase the pulls are a fixed round robin over the
+    surviving arms, so they are returned as one block. The block stops early at a halving point,
+    because halving needs the rewards of the block first.
+
+    :param n: The maximum number of arms to return.
+    :return: Arms to pull, in order (same sequence as n calls to choose_arm).
+    """
+    stats = self.stats
+    first = []
+    if self.current_iteration == self.schedule.round_pulls:
+      first = [self.choose_arm()]
+      n = n - 1
+
+    if self.schedule.round_pulls is not None: n = min(n, self.schedule.round_pulls - self.current_iteration)
+    positions = (self.current_arm_idx + 1 + np.arange(n)) % stats.num_survivors
+    arms = stats.survivor_view[positions]
+    if n > 0:
+      self.current_arm_idx = int(positions[-1])
+      self.current_arm = int(arms[-1])
+      self.current_iteration = self.current_iteration + n
+      if self.return_hist: self.hist.extend(arms)
+
+    return np.concatenate((first, arms)).astype(np.int64) if first else arms
+
+
   def observe_reward(self, arm: int, reward: float) -> None:
     """
     This function lets us observe rewards from arms we have selected.
 
     :param arm: Index (starting at 0) of the arm we played.
     :param reward: The reward we received.
-    
-    """
-    
-    vis = self.visits.get(arm)+1
-    self.visits.update({arm: vis})
-    rew = self.total_rewards.get(arm) + reward
-    self.total_rewards.update({arm: self.total_rewards.get(arm) + reward})
-    cur_rew = self.total_rewards.get(arm)/self.visits.get(arm)
-    self.current_rewards.update({arm: cur_rew})
-    self.current_arms.update({arm: self.total_rewards.get(arm)/self.visits.get(arm)})
-    self.total_means.update({arm: self.total_rewards.get(arm)/self.visits.get(arm)})
-    
-    
-    
-    # self.visits[self.current_arms.index(arm)] = self.visits[self.current_arms.index(arm)] + 1
-    # self.total_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)] + reward
-    # self.total_means[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
-    # self.current_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
-    
-    
+
+    """
+    self.stats.observe(arm, reward)
+
+  def observe_rewards(self, arms, rewards, round_robin=False) -> None:
+    """
+    Bulk version of observe_reward.
+
+    :param arms: Indices of the arms we played.
+    :param rewards: The rewards we received, aligned with arms.
+    :param round_robin: Whether arms is a block exactly as returned by choose_arms.
+    """
+    self.stats.observe_many(arms, rewards, round_robin)
+
+  def warm_start(self, visits, total_rewards) -> None:
+    """
+    Start from the given visits and reward sums per arm instead of from zero.
+    """
+    self.stats.load(visits, total_rewards)
+
+  def run_until(self, source, iterations=None, clock=None, block=None) -> "RunSummary":
+    """
+    Pull arms from source until `iterations` pulls are done or the deadline passes, see run_until.
+    """
+    return run_until(self, source, iterations, clock, block)
+
+  def recommend(self, by="mean") -> int:
+    """
+    The arm the algorithm would play if it was stopped now, in O(1).
+
+    :param by: "mean" for the highest observed mean, "visits" for the most pulled arm.
+    """
+    return self.stats.best.arm(by)
+
 
   def __str__(self):
     return print(f"Sequential_halving:\nArm history: {self.hist}\n")
 
 class SequentialHalvingAlgAnyTime_v1:
-  def __init__(self, time_budget, return_hist=False, k=10):
+  def __init__(self, time_budget, return_hist=False, k=10, ordered_halving=True, timer=WALL_TIMER):
+    """
+    :param timer: Source of time for the budget, WALL_TIMER or a VirtualTimer to simulate time.
+    """
     self.time_budget = time_budget
     self.stop_time = int(round(time.time() * 1000)) + time_budget
-    self.original_indices = {index: 0 for index, arm in enumerate(range(k))}  # Map arm to its original index
-    self.current_arms = {index: 0 for index, arm in enumerate(range(k))}
-    self.current_arms_keys = list(self.current_arms.keys())
+    self.timer = timer
+    self.clock = timer.deadline(time_budget) #Amortised deadline checks for whoever drives the search
+    self.stats = ArmStatistics(k, ordered_halving) #Visits, rewards, means and surviving arms
+    self.visits = self.stats.visits  #The amount of times that the algorithm has pulled each arm
+    self.total_rewards = self.stats.total_rewards  #The total rewards that the algorithm has observed for each arm
+    self.total_means = self.stats.total_means #The mean reward that the algorithm has observed for each arm
+    self.k = k
     self.keys_idx = 0
-    self.current_arm = self.current_arms_keys[self.keys_idx] #Keeping track of the current arm to pull
-    self.current_rewards = {index: 0 for index, arm in enumerate(range(k))}  # Map arm to its original index
-    self.visits = {index: 0 for index, arm in enumerate(range(k))}  #The amount of times that the algorithm has pulled each arm
-    self.total_rewards =  {index: 0 for index, arm in enumerate(range(k))}  #The total rewards that the algorithm has observed for each arm
-    self.total_means = {index: 0 for index, arm in enumerate(range(k))} #The total rewards that the algorithm has observed for each arm
-    self.hist = []
+    self.current_arm = self.stats.survivors[self.keys_idx] #Keeping track of the current arm to pull
+    self.hist = PullHistory(k)
     self.return_hist = return_hist
     self.round_iter = 0
 
-   
-     
-  def sort_arms(self, arms):
-    # Pair each arm with its corresponding reward, sort the pairs, and extract the arms
-      # self.current_arms, self.current_rewards = zip(*sorted(zip(self.current_arms, self.current_rewards), key=lambda x: x[1], reverse=True))
-      # self.current_arms = list(self.current_arms)
-      # self.current_rewards = list(self.current_rewards)
-     sorted_dict = dict(sorted(arms.items(), key=lambda item: item[1], reverse=True))
-     return sorted_dict
-   
-   
+
   def choose_arm(self) -> int:
-    #print(f"current_arm: {self.current_arm} current index: {self.current_arms.index(self.current_arm)} considered_arms_amt: {self.considered_arms_amt} current_round: {self.current_round} budget_left: {self.budget_left} sample_count_per_arm: {self.sample_count_per_arm} arms left: {len(self.current_arms)}")
-    
-    if self.round_iter >= len(self.current_arms):#If this is true, we are ready to halve the search or we are ready to start over
+    stats = self.stats
+    if self.round_iter >= self.k:#If this is true, we are ready to halve the search or we are ready to start over
       self.round_iter = 0
-      if len(self.current_arms_keys) <= 2:#if true we reset the nodes we search
-        self.keys_idx = 0
-        self.current_arms_keys = list(self.current_arms.keys())
-        
+      if stats.num_survivors <= 2:#if true we reset the arms we search
+        stats.reset_survivors()
+
       else:#Otherwise we halve and continue with best arms
-        
-        half_size = math.ceil(len(self.current_arms_keys)/2)
+        half_size = math.ceil(stats.num_survivors/2)
         if(half_size<2): half_size = 2
-        # print("halfsize: " + str(half_size))
-        # print("current_arms: " + str(self.current_arms))
-        
-        temp_dict = {}
-        for key in self.current_arms_keys:
-          temp_dict.update({key : self.current_arms.get(key)})
-          
-        # print("temp dict: " + str(temp_dict))
-        current_arms_sorted = self.sort_arms(temp_dict)
-        # print("sorted: " + str(current_arms_sorted))
-        sorted_keys = list(current_arms_sorted.keys())
-        # print("sorted keys: " + str(sorted_keys))
-        
-        self.current_arms_keys = []
-        for i in range(0,half_size):
-          self.current_arms_keys.append(sorted_keys[i])
-        
-        # print("new current_arm_keys list: " + str(self.current_arms_keys))
-        self.keys_idx = 0
-        
+        stats.halve(half_size)
+
+      self.keys_idx = 0
+      if self.return_hist: self.hist.new_phase(stats.survivor_view[:stats.num_survivors])
+
     else:
       self.round_iter = self.round_iter + 1
       self.keys_idx = self.keys_idx + 1
-      if self.keys_idx >= len(self.current_arms_keys): self.keys_idx = 0
-      
-    self.current_arm = self.current_arms_keys[self.keys_idx]
-      # print("Current_arms: " + str(self.current_arms))
-      # print("Current_arms_keys: " + str(self.current_arms_keys))
-      # print(self.keys_idx)
-      # print("curarm: " + str(self.current_arm))
+      if self.keys_idx >= stats.num_survivors: self.keys_idx = 0
+
+    self.current_arm = stats.survivors[self.keys_idx]
     if self.return_hist: self.hist.append(self.current_arm)
 
     return self.current_arm
 
-      
+  def choose_arms(self, n) -> np.ndarray:
+    """
+    Bulk version of choose_arm. Returns the rest of the current round (at most n arms) as one
+    block; the block stops early where the next halving or reset happens.
+
+    :param n: The maximum number of arms to return.
+    :return: Arms to pull, in order (same sequence as n calls to choose_arm).
+    """
+    stats = self.stats
+    first = []
+    if self.round_iter >= self.k:
+      first = [self.choose_arm()]
+      n = n - 1
+
+    n = min(n, self.k - self.round_iter)
+    positions = (self.keys_idx + 1 + np.arange(n)) % stats.num_survivors
+    arms = stats.survivor_view[positions]
+    if n > 0:
+      self.keys_idx = int(positions[-1])
+      self.current_arm = int(arms[-1])
+      self.round_iter = self.round_iter + n
+      if self.return_hist: self.hist.extend(arms)
+
+    return np.concatenate((first, arms)).astype(np.int64) if first else arms
+
+
 
   def observe_reward(self, arm: int, reward: float) -> None:
     """
@@ -259,195 +516,135 @@ class SequentialHalvingAlgAnyTime_v1:
 
     :param arm: Index (starting at 0) of the arm we played.
     :param reward: The reward we received.
-    
-    """
-    # self.visits[self.current_arms.index(arm)] = self.visits[self.current_arms.index(arm)] + 1
-    vis = self.visits.get(arm)+1
-    self.visits.update({arm: vis})
-    # self.total_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)] + reward
-    rew = self.total_rewards.get(arm) + reward
-    self.total_rewards.update({arm: self.total_rewards.get(arm) + reward})
-    
-    #self.total_means[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
-
-    
-    
-    # self.current_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
-    cur_rew = self.total_rewards.get(arm)/self.visits.get(arm)
-    
-    
-    self.current_rewards.update({arm: cur_rew})
-    self.current_arms.update({arm: self.total_rewards.get(arm)/self.visits.get(arm)})
-    self.total_means.update({arm: self.total_rewards.get(arm)/self.visits.get(arm)})
-    
-    #print(self.current_rewards)
-#     self.visits[self.current_arms.index(arm)] = self.visits[self.current_arms.index(arm)] + 1
-#     self.total_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)] + reward
-#     self.total_means[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
-#     self.current_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
+
+    """
+    self.stats.observe(arm, reward)
+
+  def observe_rewards(self, arms, rewards, round_robin=False) -> None:
+    """
+    Bulk version of observe_reward.
+
+    :param arms: Indices of the arms we played.
+    :param rewards: The rewards we received, aligned with arms.
+    :param round_robin: Whether arms is a block exactly as returned by choose_arms.
+    """
+    self.stats.observe_many(arms, rewards, round_robin)
+
+  def warm_start(self, visits, total_rewards) -> None:
+    """
+    Start from the given visits and reward sums per arm instead of from zero.
+    """
+    self.stats.load(visits, total_rewards)
+
+  def run_until(self, source, iterations=None, clock=None, block=None) -> "RunSummary":
+    """
+    Pull arms from source until `iterations` pulls are done or the deadline passes, see run_until.
+    """
+    return run_until(self, source, iterations, clock, block)
+
+  def recommend(self, by="mean") -> int:
+    """
+    The arm the algorithm would play if it was stopped now, in O(1).
+
+    :param by: "mean" for the highest observed mean, "visits" for the most pulled arm.
+    """
+    return self.stats.best.arm(by)
 
 
   def __str__(self):
     return print(f"Sequential_halving:\nArm history: {self.hist}\n")
-  
-  
+
+
 class SequentialHalvingAlgTime_v1:
   """
   Baseline sequential halving algorithm using a time based budget (inspired by Karnin et al., 2013).
   Rotates through arms sequentially (pun intended) until a round is over, then halves.
-  TODO: Find out why regret is so high: 
+  TODO: Find out why regret is so high:
   1. Is the indexing of pruned arms incorrect?
   2. Is the measure of regret incorrect?
-    - measure iterations 
+    - measure iterations
   """
-  
-  def __init__(self, time_budget, return_hist=False, k=10):
-      #self.current_arms = range(k) #A list of all arms that the algorithm cares about. Will be sequentially halved ;)
-      self.original_indices = {index: 0 for index, arm in enumerate(range(k))}  # Map arm to its original index
-      self.current_arms = {index: 0 for index, arm in enumerate(range(k))}
-      self.current_arm = self.current_arms.get(0) #Keeping track of the current arm to pull
-      self.current_rewards = {index: 0 for index, arm in enumerate(range(k))}  # Map arm to its original index
-      self.visits = {index: 0 for index, arm in enumerate(range(k))}  #The amount of times that the algorithm has pulled each arm
-      self.total_rewards =  {index: 0 for index, arm in enumerate(range(k))}  #The total rewards that the algorithm has observed for each arm
+
+  def __init__(self, time_budget, return_hist=False, k=10, ordered_halving=True, timer=WALL_TIMER):
+      """
+      :param timer: Source of time for the budget, WALL_TIMER or a VirtualTimer to simulate time.
+      """
+      self.stats = ArmStatistics(k, ordered_halving) #Visits, rewards, means and surviving arms
+      self.visits = self.stats.visits  #The amount of times that the algorithm has pulled each arm
+      self.total_rewards = self.stats.total_rewards  #The total rewards that the algorithm has observed for each arm
+      self.total_means = self.stats.total_means #The mean reward that the algorithm has observed for each arm
+      self.current_arm = 0 #Keeping track of the current arm to pull
       self.considered_arms_amt = k #The amount of arms that the algorithm is currently considering
-      self.total_means = {index: 0 for index, arm in enumerate(range(k))} #The total rewards that the algorithm has observed for each arm
       self.k = k
-      
+
       self.time_budget = time_budget
       self.sample_count_per_arm = self.get_dist_per_arm(k) #Amount of times by which each arm should be sampled (as per Karnin et al algorithm).
-      self.current_iteration = 0 
-      
+      self.current_iteration = 0
+
       self.budget_left = time_budget
-      
+
       self.phases = math.ceil(math.log2(k))
       self.round_time = time_budget/self.phases
       self.current_arm_idx = 0
-      
+
       self.current_round = 1
       self.return_hist = return_hist
-      self.hist = [] #Stores history of arms pulled
-      self.current_time = int(round(time.time() * 1000))
-      self.prev_switch_time = self.current_time
-      self.start_time = self.current_time
-      
-      
-
-  
-  
+      self.hist = PullHistory(k, markers=True) #Stores history of arms pulled, with a "#" at every halving
+      self.timer = timer
+      self.clock = timer.deadline(time_budget) #The whole time budget
+      self.round_clock = timer.deadline(self.round_time, charge=False) #Time left in the current round, pulls are charged to the budget clock
+
+
+
+
+
   """
   Retruns the amount of time to be allocated to each arm.
   """
   def get_dist_per_arm(self, num_arms):
       return math.floor(self.time_budget/(num_arms*math.ceil(math.log2(num_arms))))
-    
-  
+
+
   def reset(self) -> None:
-    self.current_arms = range(self.k)
-    self.current_arm = self.current_arms[0]
-    self.current_rewards = [0] * self.k
-    self.visits = [0] * self.k 
-    self.total_rewards = [0] * self.k 
+    self.stats.reset()
+    self.current_arm = 0
+    self.current_arm_idx = 0
     self.considered_arms_amt = self.k
     self.sample_count_per_arm = self.get_dist_per_arm(self.k)
     self.budget_left = self.time_budget
     self.current_round = 1
-    self.hist = [] #Stores history of arms pulled
-    #self.budget_left = self.time_steps_per_problem
-    self.current_time = int(round(time.time() * 1000))
-    self.prev_switch_time = self.current_time
-    self.start_time = self.current_time
-    
-  def sort_arms(self, arms):
-    # Pair each arm with its corresponding reward, sort the pairs, and extract the arms
-      # self.current_arms, self.current_rewards = zip(*sorted(zip(self.current_arms, self.current_rewards), key=lambda x: x[1], reverse=True))
-      # self.current_arms = list(self.current_arms)
-      # self.current_rewards = list(self.current_rewards)
-     sorted_dict = dict(sorted(arms.items(), key=lambda item: item[1], reverse=True))
-     return sorted_dict
-   
-  def halve_arms(self, arms):
-      #print('here')
-      new_dict = {}
-      keys = list(arms.keys())
-      #print('len keys: ', len(keys))
-      #print('considered arms amount: ', self.considered_arms_amt)
-      # print('Amount after halving: ', (math.ceil(len(keys) / (self.considered_arms_amt/2))))
-      #ran = math.ceil(len(keys) / (self.considered_arms_amt/2))
-      ran = math.ceil(len(keys)/2)
-      #print('Amount after halving: ', ran)
-      for i in range(ran):
-          new_dict[keys[i]] = arms[keys[i]]
-      return new_dict
-      
+    self.hist = PullHistory(self.k, markers=True) #Stores history of arms pulled, with a "#" at every halving
+    self.clock.restart(self.time_budget)
+    self.round_clock.restart(self.round_time)
+
 
   def choose_arm(self) -> int:
-    #print(f"current_arm: {self.current_arm} current index: {self.current_arms.index(self.current_arm)} considered_arms_amt: {self.considered_arms_amt} current_round: {self.current_round} budget_left: {self.budget_left} sample_count_per_arm: {self.sample_count_per_arm} arms left: {len(self.current_arms)}")
-    
-    self.current_time = int(round(time.time() * 1000))
-    #print(f"Current round: {self.current_round} round time: {self.round_time}")
-    
-      #print(f"current_arms.index(self.current_arm): {self.current_arms.index(self.current_arm)}, considered_arms_amt: {self.considered_arms_amt}")
-    # print(f"time elapsed: {self.current_time - self.prev_switch_time} round time: {self.round_time}")
-    
-    if self.current_time - self.prev_switch_time >= self.round_time:
-      
-      # Pair each arm with its corresponding reward, sort the pairs, and extract the arms
-      # print("*************************")
-      # print("before sorting: ", self.current_arms)
-      self.current_arms = self.sort_arms(self.current_arms)
-      # print("after sorting: ", self.current_arms)
-      self.current_arms = self.halve_arms(self.current_arms)
-      # print("after halving: ", self.current_arms)
-      # print("*************************\n\n")
-      self.considered_arms_amt = len(self.current_arms)
-      # self.round_time = math.ceil(self.round_time/self.phases)
-      
-      # self.current_arms = self.current_arms[:math.ceil(self.considered_arms_amt/2)] #Take top half of the list
-      # self.current_rewards = self.current_rewards[:math.ceil(self.considered_arms_amt/2)]
-      # self.considered_arms_amt = len(self.current_arms)
-      # self.current_round = self.current_round + 1
-      
-
-      
-
-      self.current_arm = list(self.current_arms.keys())[0]
+    stats = self.stats
+
+    if self.round_clock.tick():
+      stats.halve(math.ceil(stats.num_survivors/2))
+      self.considered_arms_amt = stats.num_survivors
+
+      self.current_arm = stats.survivors[0]
       self.current_arm_idx = 0
-      if len(self.current_arms) > 1: self.current_arm_idx = self.current_arm_idx + 1
-      
-      # print("here")
+      if stats.num_survivors > 1: self.current_arm_idx = self.current_arm_idx + 1
+
       if self.return_hist:
-        self.hist.append("#") 
+        self.hist.new_phase(stats.survivor_view[:stats.num_survivors])
         self.hist.append(self.current_arm)
-      self.prev_switch_time = int(round(time.time() * 1000))
+      self.round_clock.restart(self.round_time)
       return self.current_arm
-    
-    
-    
-    
-    
-    
-    if self.current_arm_idx == len(self.current_arms) - 1:
-      self.current_arm_idx = 0
-    else:
-      self.current_arm_idx = self.current_arm_idx + 1
-    
-    #print("list size: ", len(self.current_arms))
-    #
-    #print((self.current_arms))
-    #print((self.current_arm))
-    
-    self.current_arm = list(self.current_arms.keys())[self.current_arm_idx]
-    #print("idx: ", self.current_arm_idx) 
-    #print((self.current_arm))
-    #print(list(self.current_arms.keys()))
-    
+
+    idx = self.current_arm_idx + 1
+    if idx >= stats.num_survivors: idx = 0
+    self.current_arm_idx = idx
+    self.current_arm = stats.survivors[idx]
+
     if self.return_hist: self.hist.append(self.current_arm)
-    
-    self.current_time = int(round(time.time() * 1000))
-    
+
     return self.current_arm
 
-      
+
 
   def observe_reward(self, arm: int, reward: float) -> None:
     """
@@ -455,72 +652,155 @@ class SequentialHalvingAlgTime_v1:
 
     :param arm: Index (starting at 0) of the arm we played.
     :param reward: The reward we received.
-    
-    """
-    # self.visits[self.current_arms.index(arm)] = self.visits[self.current_arms.index(arm)] + 1
-    vis = self.visits.get(arm)+1
-    self.visits.update({arm: vis})
-    # self.total_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)] + reward
-    rew = self.total_rewards.get(arm) + reward
-    self.total_rewards.update({arm: self.total_rewards.get(arm) + reward})
-    
-    #self.total_means[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
-
-    
-    
-    # self.current_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
-    cur_rew = self.total_rewards.get(arm)/self.visits.get(arm)
-    
-    
-    self.current_rewards.update({arm: cur_rew})
-    self.current_arms.update({arm: self.total_rewards.get(arm)/self.visits.get(arm)})
-    self.total_means.update({arm: self.total_rewards.get(arm)/self.visits.get(arm)})
-    
-    #print(self.current_rewards)
-#     self.visits[self.current_arms.index(arm)] = self.visits[self.current_arms.index(arm)] + 1
-#     self.total_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)] + reward
-#     self.total_means[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
-#     self.current_rewards[self.current_arms.index(arm)] = self.total_rewards[self.current_arms.index(arm)]/self.visits[self.current_arms.index(arm)]
+
+    """
+    self.stats.observe(arm, reward)
+
+  def warm_start(self, visits, total_rewards) -> None:
+    """
+    Start from the given visits and reward sums per arm instead of from zero.
+    """
+    self.stats.load(visits, total_rewards)
+
+  def run_until(self, source, iterations=None, clock=None, block=None) -> "RunSummary":
+    """
+    Pull arms from source until `iterations` pulls are done or the deadline passes, see run_until.
+    """
+    return run_until(self, source, iterations, clock, block)
+
+  def recommend(self, by="mean") -> int:
+    """
+    The arm the algorithm would play if it was stopped now, in O(1).
+
+    :param by: "mean" for the highest observed mean, "visits" for the most pulled arm.
+    """
+    return self.stats.best.arm(by)
+
 
 class UCB1:
   """
   The UCB1 algorithm.
+
+  Arm selection runs in one of two modes, which both pick exactly the arm a loop over all UCB
+  values would (lowest index on ties):
+  - "vectorized": the UCB values of all arms are computed with NumPy on every pull, O(k).
+  - "incremental": a lazy max-heap holds an upper bound on every arm's UCB value up to a horizon
+    H >= t. Only the pulled arm's entry changes per step; a choice pops candidates until the best
+    exact value beats the next bound, O(log k) per pull. The heap is rebuilt (O(k)) once t passes
+    H, which grows geometrically.
   """
 
-  def __init__(self, C: float, numarms, time_budget):
+  HORIZON_GROWTH = 1.1 #Factor by which the incremental mode's horizon exceeds t when the heap is rebuilt
+
+  def __init__(self, C: float, numarms, time_budget, mode="vectorized", timer=WALL_TIMER):
     """
     :param C: The exploration parameter C.
+    :param mode: "vectorized" or "incremental" arm selection.
+    :param timer: Source of time for the budget, WALL_TIMER or a VirtualTimer to simulate time.
     """
     self.numarms = numarms
     self.stop_time = int(round(time.time() * 1000)) + time_budget
+    self.timer = timer
+    self.clock = timer.deadline(time_budget) #Amortised deadline checks for whoever drives the search
     self.C = C
-    self.t = 0
-    self.num_pulls = [0 for _ in range(numarms)]
-    self.avg_rewards = np.zeros(numarms)
+    self.mode = mode
+    self._pulls = array('q', bytes(8 * numarms))
+    self._avg = array('d', bytes(8 * numarms))
+    self.num_pulls = np.frombuffer(self._pulls, dtype=np.int64)
+    self.avg_rewards = np.frombuffer(self._avg, dtype=np.float64)
+    self.best = BestArm(self._avg, self._pulls) #The arm to recommend
+    self.reset()
 
   def reset(self) -> None:
     """
     Reset all memory.
     """
     self.t = 0
-    self.num_pulls = [0 for _ in range(self.numarms)]
-    self.avg_rewards = np.zeros(self.numarms)
+    self.num_pulls[:] = 0
+    self.avg_rewards[:] = 0.0
+    self.best.reset()
+    self._next_unpulled = 0
+    self._versions = [0] * self.numarms
+    self._heap = []
+    self._horizon = 0
+    self._log_horizon = 0.0
 
   def choose_arm(self) -> int:
     """
     :return: Arm, in [0, k).
     """
     self.t = self.t + 1
-    ucbs = np.copy(self.avg_rewards)
+    #Unpulled arms have an infinite UCB value, the lowest index among them goes first
+    while self._next_unpulled < self.numarms and self._pulls[self._next_unpulled] > 0:
+      self._next_unpulled = self._next_unpulled + 1
+    if self._next_unpulled < self.numarms: return self._next_unpulled
+
+    if self.mode == "incremental": return self._choose_incremental()
+
+    ucbs = self.avg_rewards + self.C * np.sqrt(math.log(self.t) / self.num_pulls)
+    return int(np.argmax(ucbs))
+
+  def _choose_incremental(self) -> int:
+    if self.t > self._horizon: self._rebuild_heap()
+
+    heap, versions, avg, pulls, C = self._heap, self._versions, self._avg, self._pulls, self.C
     log_t = math.log(self.t)
+    best_val, best_arm = -math.inf, -1
+    popped = []
+    while heap:
+      neg_bound, arm, version = heap[0]
+      if version != versions[arm]:
+        heapq.heappop(heap) #Stale entry of an arm that has been pulled since
+        continue
+      if best_arm >= 0 and (best_val > -neg_bound or (best_val == -neg_bound and best_arm < arm)): break
+      popped.append(heapq.heappop(heap))
+      val = avg[arm] + C * math.sqrt(log_t / pulls[arm])
+      if val > best_val or (val == best_val and arm < best_arm):
+        best_val, best_arm = val, arm
+
+    for entry in popped: heapq.heappush(heap, entry)
+    return best_arm
+
+  def _rebuild_heap(self) -> None:
+    self._horizon = int(self.t * self.HORIZON_GROWTH) + 1
+    self._log_horizon = math.log(self._horizon)
+    self._heap = [(-self._bound(arm), arm, self._versions[arm]) for arm in range(self.numarms) if self._pulls[arm] > 0]
+    heapq.heapify(self._heap)
+
+  def _bound(self, arm) -> float:
+    # Same expression as the exact UCB value, so the bound stays >= it after rounding for t <= horizon
+    return self._avg[arm] + self.C * math.sqrt(self._log_horizon / self._pulls[arm])
+
+  def choose_arms(self, n, approximate=False) -> np.ndarray:
+    """
+    Bulk version of choose_arm. UCB1 only knows its next pulls without new rewards while some
+    arms are unpulled, so an exact block is the unpulled arms (at most n) or else a single arm.
 
-    for i in range(self.numarms):
-      if self.num_pulls[i] == 0:
-        ucbs[i] = np.inf
-      else:
-        ucbs[i] = ucbs[i] + self.C * math.sqrt(log_t / self.num_pulls[i])
+    With approximate=True, n arms are chosen from the current averages, counting every chosen
+    arm as a virtual pull so its bonus shrinks within the block (the averages are not updated).
 
-    return np.argmax(ucbs)
+    :param n: The maximum number of arms to return.
+    :param approximate: Whether to return n arms from frozen averages.
+    :return: Arms to pull, in order.
+    """
+    if not approximate:
+      unpulled = np.flatnonzero(self.num_pulls == 0)[:n]
+      if len(unpulled) == 0: return np.array([self.choose_arm()])
+      self.t = self.t + len(unpulled)
+      return unpulled
+
+    pulls = self.num_pulls.astype(np.float64)
+    with np.errstate(divide="ignore"):
+      ucbs = self.avg_rewards + self.C * np.sqrt(math.log(self.t + 1) / pulls)
+    ucbs[pulls == 0] = np.inf
+    arms = np.empty(n, dtype=np.int64)
+    for j in range(n):
+      self.t = self.t + 1
+      arm = np.argmax(ucbs)
+      arms[j] = arm
+      pulls[arm] = pulls[arm] + 1
+      ucbs[arm] = self.avg_rewards[arm] + self.C * math.sqrt(math.log(self.t) / pulls[arm])
+    return arms
 
   def observe_reward(self, arm: int, reward: float) -> None:
     """
@@ -529,12 +809,128 @@ class UCB1:
     :param arm: Index (starting at 0) of the arm we played.
     :param reward: The reward we received.
     """
-    self.num_pulls[arm] = self.num_pulls[arm] + 1
-    self.avg_rewards[arm] = self.avg_rewards[arm] + ((reward - self.avg_rewards[arm]) / self.num_pulls[arm])
+    n = self._pulls[arm] + 1
+    self._pulls[arm] = n
+    avg = self._avg[arm]
+    self._avg[arm] = avg + ((reward - avg) / n)
+    self.best.observe(arm)
+
+    if self.mode == "incremental" and self._horizon > 0:
+      version = self._versions[arm] + 1
+      self._versions[arm] = version
+      heapq.heappush(self._heap, (-self._bound(arm), arm, version))
+      if len(self._heap) > 4 * self.numarms: self._rebuild_heap() #Drop the stale entries
+
+  def observe_rewards(self, arms, rewards) -> None:
+    """
+    Bulk version of observe_reward.
+
+    :param arms: Indices of the arms we played, as returned by choose_arms.
+    :param rewards: The rewards we received, aligned with arms.
+    """
+    for arm, reward in zip(np.asarray(arms).tolist(), np.asarray(rewards).tolist()):
+      self.observe_reward(arm, reward)
+
+  def warm_start(self, visits, total_rewards) -> None:
+    """
+    Start from the given visits and reward sums per arm instead of from zero.
+    """
+    self.reset()
+    self.num_pulls[:] = visits
+    with np.errstate(invalid="ignore", divide="ignore"):
+      self.avg_rewards[:] = np.where(self.num_pulls > 0, np.asarray(total_rewards) / self.num_pulls, 0.0)
+    self.t = int(self.num_pulls.sum())
+    self.best.by_visits = int(np.argmax(self.num_pulls))
+    self.best.stale = True
+
+  def run_until(self, source, iterations=None, clock=None, block=None) -> "RunSummary":
+    """
+    Pull arms from source until `iterations` pulls are done or the deadline passes, see run_until.
+    """
+    return run_until(self, source, iterations, clock, block)
+
+  def recommend(self, by="mean") -> int:
+    """
+    The arm the algorithm would play if it was stopped now, in O(1).
+
+    :param by: "mean" for the highest average reward, "visits" for the most pulled arm.
+    """
+    return self.best.arm(by)
 
   def __str__(self):
     return f"UCB1({self.C:.3f})"
-  def __str__(self):
-    return print(f"Sequential_halving:\nArm history: {self.hist}\n")
-  
-  
\ No newline at end of file
+
+
+@dataclass(frozen=True)
+class RunSummary:
+  """
+  The outcome of one run_until call.
+  """
+  pulls: int #Arms pulled during the call
+  recommended: int #The arm recommend() gives at the end
+  mean: float #Observed mean of the recommended arm
+  elapsed_ms: float #Duration on the algorithm's timer (real time if it has none)
+  expired: bool #Whether the run stopped at the deadline rather than the iteration budget
+
+
+def run_until(algo, source, iterations=None, clock=None, block=None) -> RunSummary:
+  """
+  Drive a bandit: choose arms, draw their rewards and observe them until an iteration budget is
+  spent or a deadline passes.
+
+  SequentialHalvingAlg is pulled in blocks, which within a phase are long round robins over the
+  survivors. The other bandits are pulled one arm at a time: their blocks are at most k arms
+  (AnyTime stops a block at the end of its round, UCB1 after the first pull of every arm), and
+  for blocks that small the per-block NumPy overhead costs more than the single-pull loop. The
+  bound methods are held in locals so the loops do no attribute lookups.
+
+  :param algo: Any of the bandits in this module.
+  :param source: The rewards.RewardSource of the problem.
+  :param iterations: The amount of pulls, or None to run until the deadline.
+  :param clock: The deadline to run until, the algorithm's own clock by default.
+  :param block: The maximum amount of arms per block, by default the rest of the iteration
+                budget (the algorithm stops a block where it needs rewards first) or the clock's
+                calibrated stride (at least k arms) between deadline checks.
+  """
+  timer = getattr(algo, "timer", WALL_TIMER)
+  start = timer()
+  if iterations is None and clock is None: clock = algo.clock
+  pulls = 0
+
+  if not isinstance(algo, SequentialHalvingAlg):
+    choose, observe, draw = algo.choose_arm, algo.observe_reward, source.reward
+    if iterations is not None:
+      for _ in range(iterations):
+        arm = choose()
+        observe(arm, draw(arm))
+      pulls = iterations
+    else:
+      tick = clock.tick
+      while not tick():
+        arm = choose()
+        observe(arm, draw(arm))
+        pulls = pulls + 1
+
+  else:
+    choose, observe, draw = algo.choose_arms, algo.observe_rewards, source.rewards
+    if iterations is not None:
+      if block is None: block = iterations
+      while pulls < iterations:
+        arms = choose(min(block, iterations - pulls))
+        observe(arms, draw(arms), True)
+        pulls = pulls + len(arms)
+    else:
+      grant, tick = clock.grant, clock.tick
+      while True:
+        #Charged like the single-pull path: a virtual clock caps the block at the budget left
+        n = grant(block if block is not None else max(clock.stride, algo.k))
+        if n == 0: break
+        arms = choose(n)
+        observe(arms, draw(arms), True)
+        tick(len(arms))
+        pulls = pulls + len(arms)
+
+  best = algo.best if isinstance(algo, UCB1) else algo.stats.best
+  recommended = best.arm()
+  return RunSummary(pulls, recommended, float(best.means[recommended]), (timer() - start) / 1_000_000,
+                    clock is not None and clock.expired)
@@ -0,0 +1,45 @@
+import numpy as np
+from history import PullHistory
+
+
+def pull_counts(history, k) -> np.ndarray:
+    """
+    Amount of pulls of every arm, with bincount instead of a count() per arm.
+
+    :param history: A PullHistory, a sequence of pulled arms ("#" markers are skipped), a
+                    (num_problems, pulls) array of histories, or a list of histories.
+    :param k: The number of arms.
+    :return: Shape (k,) for a single history, (num_problems, k) for a stack of them.
+    """
+    if isinstance(history, PullHistory): return history.counts()
+    if isinstance(history, np.ndarray) and history.ndim == 2:
+        rows = np.arange(history.shape[0])[:, None]
+        flat = (rows * k + history).ravel()
+        return np.bincount(flat, minlength=history.shape[0] * k).reshape(history.shape[0], k)
+    if len(history) > 0 and not np.isscalar(history[0]) and not isinstance(history[0], str):
+        return np.stack([pull_counts(single, k) for single in history])
+    arms = np.fromiter((arm for arm in history if not isinstance(arm, str)), dtype=np.int64)
+    return np.bincount(arms, minlength=k)
+
+
+def order_by_means(means) -> np.ndarray:
+    """
+    :param means: Shape (k,) or (num_problems, k).
+    :return: The arms sorted by ascending mean (stable), along the last axis.
+    """
+    return np.argsort(means, axis=-1, kind="stable")
+
+
+def rank(means) -> np.ndarray:
+    """
+    Rank of every arm, 1 for the highest mean. Ties are ranked in index order.
+
+    :param means: Shape (k,) or (num_problems, k).
+    :return: Ranks with the same shape as means.
+    """
+    means = np.asarray(means)
+    order = np.argsort(-means, axis=-1, kind="stable")
+    ranks = np.empty(means.shape, dtype=np.int64)
+    positions = np.broadcast_to(np.arange(1, means.shape[-1] + 1), means.shape)
+    np.put_along_axis(ranks, order, positions, axis=-1)
+    return ranks
@@ -0,0 +1,44 @@
+import math
+import time
+import numpy as np
+import SequentialHalvingMAB as sh
+
+
+def legacy_halve(arms):
+    # The dict based halving the algorithms used before ArmStatistics: full sort, then copy the top half.
+    sorted_dict = dict(sorted(arms.items(), key=lambda item: item[1], reverse=True))
+    keys = list(sorted_dict.keys())
+    return {key: sorted_dict[key] for key in keys[:math.ceil(len(keys)/2)]}
+
+
+def time_halving(k, ordered, repeats):
+    """
+    Returns the mean time (ms) of one halving of k arms with random means in ArmStatistics.
+    """
+    means = np.random.normal(size=k)
+    total = 0.0
+    for _ in range(repeats):
+        stats = sh.ArmStatistics(k, ordered)
+        stats.total_means[:] = means
+        start = time.perf_counter()
+        stats.halve(math.ceil(k/2))
+        total = total + time.perf_counter() - start
+    return 1000 * total / repeats
+
+
+def time_legacy_halving(k, repeats):
+    arms = dict(enumerate(np.random.normal(size=k).tolist()))
+    start = time.perf_counter()
+    for _ in range(repeats):
+        legacy_halve(arms)
+    return 1000 * (time.perf_counter() - start) / repeats
+
+
+if __name__ == "__main__":
+    print(f"{'k':>9} | {'legacy dict (ms)':>16} | {'ordered (ms)':>12} | {'partial only (ms)':>17}")
+    for k in [10**2, 10**3, 10**4, 10**5, 10**6]:
+        repeats = max(3, 10**6 // k)
+        legacy = time_legacy_halving(k, max(1, repeats // 10))
+        ordered = time_halving(k, True, repeats)
+        partial = time_halving(k, False, repeats)
+        print(f"{k:>9} | {legacy:>16.4f} | {ordered:>12.4f} | {partial:>17.4f}")
@@ -0,0 +1,300 @@
+import numpy as np
+
+
+def bits(mask):
+    """
+    Yield the indices of the set bits of an int, lowest first.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask = mask ^ low
+
+
+def select_bits(masks, ranks) -> np.ndarray:
+    """
+    Index of the ranks[i]'th lowest set bit of masks[i], for uint64 arrays, by binary search on
+    popcounts (six steps for 64 bits).
+    """
+    ranks = ranks.astype(np.int64)
+    positions = np.zeros(len(masks), dtype=np.uint64)
+    for width in (32, 16, 8, 4, 2, 1):
+        low = (masks >> positions) & np.uint64((1 << width) - 1)
+        count = np.bitwise_count(low).astype(np.int64)
+        higher = ranks >= count
+        ranks = ranks - np.where(higher, count, 0)
+        positions = positions + np.where(higher, np.uint64(width), np.uint64(0))
+    return positions
+
+
+class Clobber:
+    """
+    Clobber on a size x size board (7 x 7 as in the Ludii experiments, at most 8 x 8) as
+    bitboards: one int per player with bit r * size + c set for a stone on row r, column c.
+
+    The board starts full in a checkerboard pattern, player 0 (white) on the squares with r + c
+    even and to move first. A move takes one of your stones onto an orthogonally adjacent stone
+    of the opponent, which is removed. The player without a move loses.
+
+    A move is encoded as 4 * to + direction (0: east, 1: west, 2: north, 3: south), so legal
+    moves come from four shift-and-mask operations. States are (white, black, player to move)
+    tuples. Implements the game interface of mcts.MCTS (with key), plus random_playouts, which
+    plays many random games at once on uint64 arrays of boards.
+    """
+
+    def __init__(self, size=7):
+        """
+        :param size: The side of the board.
+        """
+        if not 2 <= size <= 8: raise ValueError("Clobber boards must be 2x2 to 8x8 to fit in 64 bits")
+        self.size = size
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+        first_column = sum(1 << (r * size) for r in range(size))
+        last_column = first_column << (size - 1)
+        self.deltas = (1, -1, -size, size) #From the moving stone to its target, per direction
+        self.sources = (self.full & ~last_column, self.full & ~first_column, self.full, self.full) #Stones that can move that way
+        self.white = sum(1 << (r * size + c) for r in range(size) for c in range(size) if (r + c) % 2 == 0)
+        self.black = self.full & ~self.white
+
+    def initial_state(self) -> tuple:
+        return (self.white, self.black, 0)
+
+    def to_move(self, state) -> int:
+        return state[2]
+
+    def targets(self, own, opponent, direction) -> int:
+        """
+        :return: The opponent stones that own stones can capture moving in direction.
+        """
+        delta = self.deltas[direction]
+        movers = own & self.sources[direction]
+        shifted = movers << delta if delta > 0 else movers >> -delta
+        return shifted & opponent & self.full
+
+    def legal_moves(self, state) -> list:
+        own, opponent = (state[0], state[1]) if state[2] == 0 else (state[1], state[0])
+        return [4 * to + direction for direction in range(4) for to in bits(self.targets(own, opponent, direction))]
+
+    def apply(self, state, move) -> tuple:
+        to, direction = divmod(move, 4)
+        source = to - self.deltas[direction]
+        white, black, player = state
+        if player == 0:
+            return (white ^ (1 << source) ^ (1 << to), black & ~(1 << to), 1)
+        return (white & ~(1 << to), black ^ (1 << source) ^ (1 << to), 0)
+
+    def is_terminal(self, state) -> bool:
+        own, opponent = (state[0], state[1]) if state[2] == 0 else (state[1], state[0])
+        return not any(self.targets(own, opponent, direction) for direction in range(4))
+
+    def key(self, state) -> int:
+        return hash(state)
+
+    def playout(self, state, rng) -> float:
+        own, opponent = (state[0], state[1]) if state[2] == 0 else (state[1], state[0])
+        sign = 1.0 if state[2] == 0 else -1.0
+        while True:
+            targets = [self.targets(own, opponent, direction) for direction in range(4)]
+            counts = [target.bit_count() for target in targets]
+            total = sum(counts)
+            if total == 0: return -sign
+            pick = int(rng.random() * total)
+            direction = 0
+            while pick >= counts[direction]:
+                pick -= counts[direction]
+                direction += 1
+            target = targets[direction]
+            for _ in range(pick): target &= target - 1 #Drop the lowest set bits
+            to = (target & -target).bit_length() - 1
+            moved = own ^ (1 << (to - self.deltas[direction])) ^ (1 << to)
+            own, opponent, sign = opponent & ~(1 << to), moved, -sign
+
+    def random_playouts(self, white, black, to_move, rng) -> np.ndarray:
+        """
+        Play random games from many boards at once until every one is over.
+
+        :param white: uint64 array of white bitboards.
+        :param black: uint64 array of black bitboards.
+        :param to_move: The player to move on every board.
+        :param rng: A numpy Generator.
+        :return: The result for player 0 (white) of every game, 1 or -1.
+        """
+        white = np.asarray(white, dtype=np.uint64)
+        black = np.asarray(black, dtype=np.uint64)
+        first = np.asarray(to_move) == 0
+        # Boards are kept as (player to move, opponent), swapped after every move
+        own = np.where(first, white, black)
+        opponent = np.where(first, black, white)
+        sign = np.where(first, 1.0, -1.0) #Result for player 0 of a win for the player to move
+        results = np.zeros(len(own))
+        active = np.arange(len(own))
+        full = np.uint64(self.full)
+        sources = [np.uint64(source) for source in self.sources]
+        deltas = np.array(self.deltas)
+        one = np.uint64(1)
+        targets = np.empty((len(own), 4), dtype=np.uint64)
+        while len(active) > 0:
+            targets = targets[:len(active)]
+            for direction, delta in enumerate(self.deltas):
+                movers = own & sources[direction]
+                shifted = movers << np.uint64(delta) if delta > 0 else movers >> np.uint64(-delta)
+                np.bitwise_and(shifted, opponent & full, out=targets[:, direction])
+            counts = np.bitwise_count(targets).astype(np.int64)
+            ends = np.cumsum(counts, axis=1)
+            totals = ends[:, -1]
+
+            over = totals == 0 #The player to move has lost
+            if over.any():
+                results[active[over]] = -sign[over]
+                keep = ~over
+                active, sign, own, opponent, targets, counts, ends, totals = (
+                    active[keep], sign[keep], own[keep], opponent[keep], targets[keep], counts[keep], ends[keep], totals[keep])
+                if len(active) == 0: break
+
+            picks = (rng.random(len(active)) * totals).astype(np.int64)
+            directions = (picks[:, None] >= ends).sum(axis=1)
+            rows = np.arange(len(active))
+            ranks = picks - (ends[rows, directions] - counts[rows, directions])
+            to = select_bits(targets[rows, directions], ranks)
+            source = (to.astype(np.int64) - deltas[directions]).astype(np.uint64)
+
+            moved = own ^ (one << source) ^ (one << to)
+            own = opponent & ~(one << to)
+            opponent = moved
+            sign = -sign
+        return results
+
+
+class Hex:
+    """
+    Hex on a size x size rhombus (11 x 11 as in the Ludii experiments, without the swap rule) as
+    bitboards: one int per player with bit r * size + c set for a stone on row r, column c.
+    Cell (r, c) touches (r, c +- 1), (r - 1, c), (r - 1, c + 1), (r + 1, c) and (r + 1, c - 1).
+
+    Player 0 moves first and connects the top and bottom rows, player 1 the left and right
+    columns. A move is the index of an empty cell. States are (player 0, player 1, player to move)
+    tuples. Implements the game interface of mcts.MCTS (with key), plus random_playouts, which
+    plays many random games at once on boards stored as rows of bits.
+
+    A random playout fills the empty cells with a random half for each player: the board then
+    has exactly one winner, the same as if the moves had been made in turn, and a win found
+    earlier is not undone by more stones.
+    """
+
+    def __init__(self, size=11):
+        """
+        :param size: The side of the board, at most 16.
+        """
+        if not 2 <= size <= 16: raise ValueError("Hex boards must be 2x2 to 16x16")
+        self.size = size
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+        self.row_mask = (1 << size) - 1
+        self.first_column = sum(1 << (r * size) for r in range(size))
+        self.last_column = self.first_column << (size - 1)
+        self.top = self.row_mask
+        self.bottom = self.row_mask << (size * (size - 1))
+
+    def initial_state(self) -> tuple:
+        return (0, 0, 0)
+
+    def to_move(self, state) -> int:
+        return state[2]
+
+    def neighbours(self, x) -> int:
+        """
+        :return: The cells next to the cells of x.
+        """
+        size = self.size
+        east = (x << 1) & ~self.first_column
+        west = (x >> 1) & ~self.last_column
+        north_east = (x >> (size - 1)) & ~self.first_column
+        south_west = (x << (size - 1)) & ~self.last_column
+        return (east | west | north_east | south_west | (x >> size) | (x << size)) & self.full
+
+    def connected(self, stones, start, goal) -> bool:
+        """
+        :return: Whether stones connect the start edge to the goal edge (flood fill).
+        """
+        reached = stones & start
+        while reached:
+            if reached & goal: return True
+            grown = (reached | self.neighbours(reached)) & stones
+            if grown == reached: return False
+            reached = grown
+        return False
+
+    def winner(self, state) -> int:
+        """
+        :return: The player that has connected their edges, -1 if none has.
+        """
+        if self.connected(state[0], self.top, self.bottom): return 0
+        if self.connected(state[1], self.first_column, self.last_column): return 1
+        return -1
+
+    def legal_moves(self, state) -> list:
+        if self.is_terminal(state): return []
+        return list(bits(self.full & ~(state[0] | state[1])))
+
+    def apply(self, state, move) -> tuple:
+        if state[2] == 0: return (state[0] | (1 << move), state[1], 1)
+        return (state[0], state[1] | (1 << move), 0)
+
+    def is_terminal(self, state) -> bool:
+        # Only the player who moved last can have just connected
+        if state[2] == 1: return self.connected(state[0], self.top, self.bottom)
+        return self.connected(state[1], self.first_column, self.last_column)
+
+    def key(self, state) -> int:
+        return hash(state)
+
+    def rows(self, boards) -> np.ndarray:
+        """
+        :param boards: Bitboards (ints).
+        :return: (len(boards), size) uint16 array of their rows.
+        """
+        return np.array([[(board >> (r * self.size)) & self.row_mask for r in range(self.size)] for board in boards], dtype=np.uint16)
+
+    def playout(self, state, rng) -> float:
+        return float(self.random_playouts(self.rows([state[0]]), self.rows([state[1]]), np.array([state[2]]), rng)[0])
+
+    def random_playouts(self, first, second, to_move, rng) -> np.ndarray:
+        """
+        Fill many boards at once with random stones and find the winners.
+
+        :param first: (boards, size) uint16 rows of player 0's stones, see rows.
+        :param second: The same for player 1.
+        :param to_move: The player to move on every board.
+        :param rng: A numpy Generator.
+        :return: The result for player 0 of every game, 1 or -1.
+        """
+        size = self.size
+        shifts = np.arange(size, dtype=np.uint16)
+        taken = ((first | second)[:, :, None] >> shifts) & 1 #(boards, rows, columns)
+        taken = taken.reshape(len(first), -1).astype(bool)
+
+        # A random order of the empty cells; the player to move gets the even positions in it
+        keys = rng.random(taken.shape)
+        keys[taken] = 2.0
+        order = np.argsort(keys, axis=1)
+        position = np.empty_like(order)
+        np.put_along_axis(position, order, np.arange(self.cells)[None, :], axis=1)
+        mover_gets = (position % 2 == 0) & ~taken
+        gets_first = np.where((np.asarray(to_move) == 0)[:, None], mover_gets, ~mover_gets & ~taken)
+        cells = (gets_first.reshape(len(first), size, size).astype(np.uint16) << shifts).sum(axis=2, dtype=np.uint16)
+        stones = first | cells
+
+        # Flood fill from the top row over player 0's stones, one row of bits per uint16
+        mask = np.uint16(self.row_mask)
+        one = np.uint16(1)
+        reached = np.zeros_like(stones)
+        reached[:, 0] = stones[:, 0]
+        while True:
+            grown = reached | ((reached << one) & mask) | (reached >> one)
+            grown[:, 1:] |= reached[:, :-1] | (reached[:, :-1] >> one) #From (r - 1, c) and (r - 1, c + 1)
+            grown[:, :-1] |= reached[:, 1:] | ((reached[:, 1:] << one) & mask) #From (r + 1, c) and (r + 1, c - 1)
+            grown &= stones
+            if np.array_equal(grown, reached): break
+            reached = grown
+        return np.where(reached[:, -1] != 0, 1.0, -1.0)
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import numpy as np
+
+
+ENTRY_OVERHEAD = 64 #Bytes charged per entry on top of its key and value
+
+
+def code_version(modules) -> str:
+    """
+    Tag of the code a result was computed with: a hash of the source of the given modules, so
+    that editing an algorithm invalidates the results it produced.
+
+    :param modules: Module names (must be imported).
+    """
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        with open(sys.modules[name].__file__, "rb") as f: digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class CellCache:
+    """
+    Content-addressed on-disk cache of the results of experiment cells (one algorithm run on one
+    problem), in a single SQLite file.
+
+    A cell is addressed by the hash of everything its result depends on (see key), so results are
+    reused by any sweep that contains the same cell, whatever the other budgets or problems of
+    that sweep are. When the stored entries exceed max_bytes, the least recently used ones are
+    evicted.
+    """
+
+    def __init__(self, path, max_bytes=256 * 2**20, version=""):
+        """
+        :param path: The cache file, created if it does not exist.
+        :param max_bytes: Size cap of the stored entries.
+        :param version: Code version tag, part of every key (see code_version).
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS cells (key TEXT PRIMARY KEY, value TEXT, size INTEGER, used INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS cells_used ON cells (used)")
+        self.db.commit()
+
+    def key(self, means, **parts) -> str:
+        """
+        :param means: The true arm means of the problem.
+        :param parts: JSON-able description of the rest of the cell: algorithm class and
+                      parameters, budget, seed, ...
+        :return: The content address of the cell.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps([self.version, parts], sort_keys=True, default=str).encode())
+        digest.update(np.ascontiguousarray(means, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def get_many(self, keys) -> dict:
+        """
+        :return: {key: result} of the keys that are cached, marking them as recently used.
+        """
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.db.execute(f"SELECT key, value FROM cells WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            found.update((key, json.loads(value)) for key, value in rows)
+        now = time.time_ns()
+        self.db.executemany("UPDATE cells SET used = ? WHERE key = ?", [(now, key) for key in found])
+        self.db.commit()
+        self.hits = self.hits + len(found)
+        self.misses = self.misses + len(keys) - len(found)
+        return found
+
+    def put_many(self, items) -> None:
+        """
+        :param items: (key, result) pairs, results must be JSON-able.
+        """
+        now = time.time_ns()
+        rows = []
+        for key, result in items:
+            value = json.dumps(result)
+            rows.append((key, value, len(key) + len(value) + ENTRY_OVERHEAD, now))
+        self.db.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?)", rows)
+        self._evict()
+        self.db.commit()
+
+    def _evict(self) -> None:
+        excess = self.size() - self.max_bytes
+        while excess > 0:
+            rows = self.db.execute("SELECT key, size FROM cells ORDER BY used LIMIT 256").fetchall()
+            if not rows: break
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                excess = excess - size
+                if excess <= 0: break
+            self.db.executemany("DELETE FROM cells WHERE key = ?", victims)
+
+    def size(self) -> int:
+        """
+        :return: The bytes charged for all stored entries.
+        """
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM cells").fetchone()[0]
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM cells").fetchone()[0]
+
+    def close(self) -> None:
+        self.db.close()
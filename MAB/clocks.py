@@ -0,0 +1,247 @@
+import time
+import numpy as np
+
+
+class DeadlineClock:
+    """
+    A time budget that only reads the clock every `stride` pulls, shared by the time-budgeted
+    bandit classes.
+
+    Every read re-calibrates the stride from the measured cost per pull since the previous read,
+    so that running one stride past the deadline takes at most `max_overshoot_ms`. The stride at
+    most doubles per read, and shrinks straight away when pulls become more expensive.
+    """
+
+    def __init__(self, budget_ms, max_overshoot_ms=0.5, timer=time.perf_counter_ns):
+        """
+        :param budget_ms: The time budget in milliseconds, starting now.
+        :param max_overshoot_ms: Bound on the time spent past the deadline before it is noticed.
+        :param timer: Function returning the current time in nanoseconds.
+        """
+        self.timer = timer
+        self.max_overshoot_ns = max_overshoot_ms * 1_000_000
+        self.stride = 1 #Pulls between two clock reads
+        self.reads = 0 #Amount of times the clock has been read
+        self.pulls = 0 #Pulls counted up to the last read
+        self.restart(budget_ms)
+
+    def restart(self, budget_ms) -> None:
+        """
+        Start a new budget from now, keeping the calibrated stride.
+
+        :param budget_ms: The time budget in milliseconds.
+        """
+        now = self.timer()
+        self.start_ns = now
+        self.deadline_ns = now + int(budget_ms * 1_000_000)
+        self.expired = False
+        self._last_read_ns = now
+        self._window = self._countdown = self.stride
+
+    def tick(self, pulls=1) -> bool:
+        """
+        Count pulls against the budget.
+
+        :param pulls: The amount of pulls done since the previous tick.
+        :return: Whether the deadline has passed (checked once every stride pulls).
+        """
+        self._countdown = self._countdown - pulls
+        if self._countdown > 0: return False
+        return self._read()
+
+    def _read(self) -> bool:
+        if self.expired: return True
+        now = self.timer()
+        self.reads = self.reads + 1
+
+        done = self._window - self._countdown
+        self.pulls = self.pulls + done
+        elapsed = now - self._last_read_ns
+        if done > 0:
+            #Below the timer resolution the pulls are cheaper than we can measure, so just grow
+            stride = int(self.max_overshoot_ns * done / elapsed) if elapsed > 0 else 2 * self.stride
+            self.stride = max(1, min(stride, 2 * self.stride))
+        self._last_read_ns = now
+
+        if now >= self.deadline_ns:
+            self.expired = True
+            return True
+        self._window = self._countdown = self.stride
+        return False
+
+    def grant(self, pulls) -> int:
+        """
+        How many of the next `pulls` pulls may still start, for drivers that pull in blocks and
+        tick the pulls they did afterwards. Real time passes by itself, so this is all of them
+        until a tick has noticed the deadline.
+
+        :param pulls: The size of the next block.
+        :return: The amount of pulls to do, 0 once the deadline has passed.
+        """
+        return 0 if self.expired else pulls
+
+    def elapsed_ms(self) -> float:
+        """
+        :return: Milliseconds since the budget started (reads the clock).
+        """
+        return (self.timer() - self.start_ns) / 1_000_000
+
+    def remaining_ms(self) -> float:
+        """
+        :return: Milliseconds left until the deadline, negative once it has passed (reads the clock).
+        """
+        return (self.deadline_ns - self.timer()) / 1_000_000
+
+
+class VirtualDeadlineClock(DeadlineClock):
+    """
+    A DeadlineClock on a VirtualTimer. Reading virtual time is free, so the deadline is checked on
+    every tick; a charging clock first advances the timer by the modelled cost of the ticked pulls.
+    """
+
+    def __init__(self, budget_ms, timer, charge=True):
+        """
+        :param budget_ms: The time budget in milliseconds, starting at the timer's current time.
+        :param timer: The VirtualTimer to read (and advance).
+        :param charge: Whether ticks advance the timer. Only one clock per timeline should charge.
+        """
+        super().__init__(budget_ms, timer=timer)
+        self.charge = charge
+
+    def tick(self, pulls=1) -> bool:
+        if self.expired: return True
+        if self.charge and pulls: self.timer.advance(pulls)
+        self.pulls = self.pulls + pulls
+        self.reads = self.reads + 1
+        if self.timer.ns >= self.deadline_ns:
+            self.expired = True
+        return self.expired
+
+    def grant(self, pulls) -> int:
+        """
+        The pulls of the next block that end before the deadline (without charging them), so a
+        block driver makes the same pulls as one that ticks before every single pull. If none
+        fits, the first pull is charged and the clock expires, as tick() would.
+        """
+        if self.expired: return 0
+        if self.charge: pulls = self.timer.affordable(pulls, self.deadline_ns)
+        elif self.timer.ns >= self.deadline_ns: pulls = 0
+        if pulls == 0: self.tick(1)
+        return pulls
+
+
+class WallTimer:
+    """
+    Real time (perf_counter_ns), handing out DeadlineClocks.
+    """
+
+    def __call__(self) -> int:
+        return time.perf_counter_ns()
+
+    def deadline(self, budget_ms, charge=True) -> DeadlineClock:
+        """
+        :param budget_ms: The time budget in milliseconds, starting now.
+        :param charge: Unused, real time passes by itself.
+        """
+        return DeadlineClock(budget_ms)
+
+
+class VirtualTimer:
+    """
+    Simulated time that only advances by a modelled cost per pull, so time-budget experiments run
+    as fast as the CPU allows and do not depend on machine load.
+
+    The cost is either fixed (a number of nanoseconds) or drawn per pull from a measured profile
+    of pull costs with a seeded generator, which makes every run bit-reproducible.
+    """
+
+    BLOCK = 4096 #Pull costs drawn from the profile at a time
+
+    def __init__(self, cost_ns, seed=None):
+        """
+        :param cost_ns: Cost of one pull in ns, or an array of measured pull costs to sample from.
+        :param seed: Seed for sampling from a profile.
+        """
+        self.ns = 0
+        if np.ndim(cost_ns) == 0:
+            self.cost_ns = int(cost_ns)
+            self.profile = None
+        else:
+            self.cost_ns = None
+            self.profile = np.asarray(cost_ns, dtype=np.int64)
+            self.rng = np.random.default_rng(seed)
+            self._costs = np.empty(0, dtype=np.int64)
+            self._next = 0
+
+    def __call__(self) -> int:
+        return self.ns
+
+    def advance(self, pulls) -> None:
+        """
+        :param pulls: The amount of pulls whose cost passes.
+        """
+        if self.profile is None:
+            self.ns = self.ns + pulls * self.cost_ns
+            return
+        while pulls > 0:
+            if self._next == len(self._costs):
+                self._costs = self.rng.choice(self.profile, size=self.BLOCK)
+                self._next = 0
+            take = min(pulls, len(self._costs) - self._next)
+            self.ns = self.ns + int(self._costs[self._next:self._next + take].sum())
+            self._next = self._next + take
+            pulls = pulls - take
+
+    def affordable(self, pulls, deadline_ns) -> int:
+        """
+        :param pulls: The size of the next block.
+        :param deadline_ns: The deadline.
+        :return: How many of the next pulls end before the deadline (at most pulls). Looks
+                 ahead in the cost profile without advancing the timer.
+        """
+        if self.profile is None:
+            if self.cost_ns <= 0: return pulls
+            return max(0, min(pulls, (deadline_ns - self.ns - 1) // self.cost_ns))
+        counted, at, ns = 0, self._next, self.ns
+        while counted < pulls:
+            if at == len(self._costs):
+                #Draw the next costs in the same order advance would, keeping the unused ones
+                self._costs = np.concatenate((self._costs[self._next:], self.rng.choice(self.profile, size=self.BLOCK)))
+                at = at - self._next
+                self._next = 0
+            take = min(pulls - counted, len(self._costs) - at)
+            ends = ns + np.cumsum(self._costs[at:at + take])
+            fit = int(np.searchsorted(ends, deadline_ns, side="left"))
+            counted = counted + fit
+            if fit < take: break
+            ns = int(ends[-1])
+            at = at + take
+        return counted
+
+    def deadline(self, budget_ms, charge=True) -> VirtualDeadlineClock:
+        """
+        :param budget_ms: The time budget in milliseconds, starting at the current virtual time.
+        :param charge: Whether ticks of this clock advance the timer.
+        """
+        return VirtualDeadlineClock(budget_ms, self, charge)
+
+
+WALL_TIMER = WallTimer()
+
+
+def measure_pull_costs(algo, pull, pulls=10000) -> np.ndarray:
+    """
+    Measures the real cost of single pulls, to use as a VirtualTimer profile.
+
+    :param algo: The bandit to pull.
+    :param pull: Function taking the algorithm and doing one pull (choose, sample and observe).
+    :param pulls: The amount of pulls to measure.
+    :return: The cost of every pull in nanoseconds.
+    """
+    costs = np.empty(pulls, dtype=np.int64)
+    timer = time.perf_counter_ns
+    for i in range(pulls):
+        start = timer()
+        pull(algo)
+        costs[i] = timer() - start
+    return costs
@@ -0,0 +1,232 @@
+from array import array
+from itertools import islice
+import numpy as np
+
+
+class PullHistory:
+    """
+    Compact history of the arms pulled by a bandit, replacing a Python list of every pull.
+
+    Pulls are stored as runs in typed arrays. A run is an (arm, run_length) pair that starts at
+    `arm` and follows the round robin order of the current phase, which is how the halving
+    algorithms pull, so a phase usually costs one or two runs however many pulls it has. An arm
+    that is not in the phase order is stored as a run of repeats. Phases (halvings or restarts)
+    are recorded with new_phase. A phase order is only copied when it is new: a restart to all
+    arms in index order and an order equal to the previous phase's refer to what is stored.
+    Arms and run positions use the smallest typecode that holds k.
+
+    Iterating decodes the pulls lazily; with markers=True a "#" is yielded where every phase
+    after the first starts, like SequentialHalvingAlgTime_v1 used to put in its history list.
+    len(), count(), iteration and tolist() behave as on that list.
+    """
+
+    IDENTITY = -1 #Order start of a phase over all arms in index order
+
+    def __init__(self, k, markers=False, order=None):
+        """
+        :param k: The number of arms.
+        :param markers: Whether iteration yields a "#" at the start of every later phase.
+        :param order: Arm order of the first phase, all arms in index order by default.
+        """
+        self.k = k
+        self.markers = markers
+        self.pulls = 0
+        arm_type = next(code for code in "bhiq" if k <= 2**(8 * array(code).itemsize - 1) - 1)
+        self._run_arms = array(arm_type) #First arm of every closed run
+        self._run_positions = array(arm_type) #Position of that arm in its phase order, -1 for repeats
+        self._run_lengths = array('q')
+        self._orders = array(arm_type) #The distinct arm orders of the phases, concatenated
+        self._order_starts = array('i') #Where every phase's order starts in _orders, or IDENTITY
+        self._order_lengths = array(arm_type)
+        self._phase_runs = array('i') #Index of the first run of every phase
+        self._counts = [0] * k #Pulls per arm of the closed runs
+        self._cache = (-1, None)
+        self._identity = list(range(k))
+
+        self._cycle = []
+        self._order = None
+        self._run_arm = -1
+        self._run_position = -1
+        self._run_length = 0
+        self.new_phase(self._identity if order is None else order)
+
+    def new_phase(self, order) -> None:
+        """
+        Start a phase whose pulls follow the given arm order round robin.
+
+        :param order: The arm order of the phase, e.g. the surviving arms.
+        """
+        self._close_run()
+        cycle = order.tolist() if isinstance(order, np.ndarray) else [int(arm) for arm in order]
+        if cycle == self._identity:
+            start = self.IDENTITY
+        elif self._order_starts and cycle == self._cycle:
+            start = self._order_starts[-1]
+        else:
+            start = len(self._orders)
+            self._orders.extend(cycle)
+        self._order_starts.append(start)
+        self._order_lengths.append(len(cycle))
+        self._phase_runs.append(len(self._run_lengths))
+        self._cycle = cycle
+        self._order = None #NumPy copy of the cycle, made when a long block needs it
+        self._expected = -1
+        self._next = -1
+
+    def append(self, arm) -> None:
+        """
+        :param arm: The arm pulled next.
+        """
+        if arm != self._expected:
+            self._start_run(int(arm))
+            return
+        self.pulls = self.pulls + 1
+        self._run_length = self._run_length + 1
+        next_position = self._next
+        if next_position >= 0:
+            next_position = next_position + 1
+            if next_position == len(self._cycle): next_position = 0
+            self._next = next_position
+            self._expected = self._cycle[next_position]
+
+    def extend(self, arms) -> None:
+        """
+        :param arms: The arms pulled next, in order. A block that continues the round robin of
+                     the current phase is added to the open run in one go.
+        """
+        n = len(arms)
+        if n == 0: return
+        if self._next >= 0 and arms[0] == self._expected:
+            cycle, at = self._cycle, self._next
+            if at + n <= len(cycle):
+                follows = cycle[at:at + n] == (arms.tolist() if isinstance(arms, np.ndarray) else list(arms))
+            else:
+                if self._order is None: self._order = np.array(cycle, dtype=np.int64)
+                follows = np.array_equal(self._order[(at + np.arange(n)) % len(cycle)], arms)
+            if follows:
+                self.pulls = self.pulls + n
+                self._run_length = self._run_length + n
+                self._next = (at + n) % len(cycle)
+                self._expected = cycle[self._next]
+                return
+        for arm in arms: self.append(int(arm))
+
+    def _start_run(self, arm) -> None:
+        self._close_run()
+        try:
+            position = self._cycle.index(arm)
+        except ValueError:
+            position = -1
+        self._run_arm = arm
+        self._run_position = position
+        self._run_length = 1
+        self.pulls = self.pulls + 1
+        if position < 0:
+            self._next = -1
+            self._expected = arm
+        else:
+            self._next = position + 1 if position + 1 < len(self._cycle) else 0
+            self._expected = self._cycle[self._next]
+
+    def _close_run(self) -> None:
+        if self._run_length == 0: return
+        self._run_arms.append(self._run_arm)
+        self._run_positions.append(self._run_position)
+        self._run_lengths.append(self._run_length)
+        self._add_counts(self._counts, self._cycle, self._run_arm, self._run_position, self._run_length)
+        self._run_length = 0
+
+    @staticmethod
+    def _add_counts(counts, cycle, arm, position, length) -> None:
+        if position < 0:
+            counts[arm] += length
+            return
+        n = len(cycle)
+        full, rest = divmod(length, n)
+        if full:
+            for other in cycle: counts[other] += full
+        for i in range(position, position + rest): counts[cycle[i % n]] += 1
+
+    def counts(self) -> np.ndarray:
+        """
+        :return: The amount of pulls of every arm, O(k) per phase instead of O(pulls).
+        """
+        pulls, counts = self._cache
+        if pulls == self.pulls: return counts
+        counts = list(self._counts)
+        if self._run_length:
+            self._add_counts(counts, self._cycle, self._run_arm, self._run_position, self._run_length)
+        counts = np.array(counts, dtype=np.int64)
+        self._cache = (self.pulls, counts)
+        return counts
+
+    def phase_boundaries(self) -> np.ndarray:
+        """
+        :return: The pull index at which every phase starts.
+        """
+        lengths = self.runs()[2]
+        ends = np.concatenate(([0], np.cumsum(lengths)))
+        return ends[np.array(self._phase_runs, dtype=np.int64)]
+
+    def phase_order(self, phase) -> list:
+        """
+        :return: The arm order of a phase.
+        """
+        start = self._order_starts[phase]
+        if start == self.IDENTITY: return self._identity
+        return self._orders[start:start + self._order_lengths[phase]].tolist()
+
+    def runs(self):
+        """
+        :return: (arms, positions, lengths) of all runs as arrays, including the open run.
+        """
+        arms = np.array(self._run_arms.tolist(), dtype=np.int64)
+        positions = np.array(self._run_positions.tolist(), dtype=np.int64)
+        lengths = np.array(self._run_lengths.tolist(), dtype=np.int64)
+        if self._run_length:
+            arms = np.append(arms, self._run_arm)
+            positions = np.append(positions, self._run_position)
+            lengths = np.append(lengths, self._run_length)
+        return arms, positions, lengths
+
+    def __iter__(self):
+        arms, positions, lengths = self.runs()
+        phases = len(self._phase_runs)
+        for phase in range(phases):
+            if self.markers and phase > 0: yield "#"
+            order = self.phase_order(phase)
+            last_run = self._phase_runs[phase + 1] if phase + 1 < phases else len(lengths)
+            for run in range(self._phase_runs[phase], last_run):
+                arm, position, length = int(arms[run]), int(positions[run]), int(lengths[run])
+                if position < 0:
+                    for _ in range(length): yield arm
+                    continue
+                n = len(order)
+                for i in range(length): yield order[(position + i) % n]
+
+    def __len__(self):
+        return self.pulls + (len(self._phase_runs) - 1 if self.markers else 0)
+
+    def count(self, value) -> int:
+        """
+        :param value: An arm, or "#" for the phase markers.
+        """
+        if isinstance(value, str):
+            return len(self._phase_runs) - 1 if self.markers and value == "#" else 0
+        if not 0 <= value < self.k: return 0
+        return int(self.counts()[value])
+
+    def tolist(self) -> list:
+        """
+        :return: The decoded history as a list, as the algorithms used to store it.
+        """
+        return list(self)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice): return self.tolist()[index]
+        if index < 0: index = index + len(self)
+        if not 0 <= index < len(self): raise IndexError("history index out of range")
+        return next(islice(self, index, None))
+
+    def __repr__(self):
+        return repr(self.tolist())
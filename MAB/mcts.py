@@ -0,0 +1,561 @@
+import math
+import time
+import weakref
+from dataclasses import dataclass
+import numpy as np
+import SequentialHalvingMAB as sh
+import parallel
+from clocks import WALL_TIMER
+
+
+UNEXPANDED = -1 #first_child of a node whose children have not been created yet
+TERMINAL = -2 #first_child of a node whose state is terminal
+KEY_MASK = (1 << 63) - 1 #Transposition keys are kept as non-negative int64
+
+
+class NodeArrays:
+    """
+    Struct-of-arrays storage of a search tree: one growable NumPy buffer per node field instead
+    of one Python object per node, so trees of millions of nodes cost ~50 bytes per node and
+    nothing for the garbage collector to trace.
+
+    Node 0 is the root. The children of a node are created together and stored contiguously,
+    from first_child to first_child + num_children.
+    """
+
+    FIELDS = (("parent", np.int32), ("first_child", np.int32), ("num_children", np.int32),
+              ("move", np.int64), ("player", np.int8), ("visits", np.int64), ("value_sums", np.float64),
+              ("key", np.int64), ("entry", np.int32)) #key and entry are only used with a TranspositionTable
+
+    def __init__(self, capacity=1 << 16):
+        """
+        :param capacity: The amount of nodes to allocate for up front, doubled when exceeded.
+        """
+        self.size = 0
+        self.capacity = max(1, capacity)
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(self.capacity, dtype=dtype))
+
+    def _grow(self, needed) -> None:
+        capacity = self.capacity
+        while capacity < needed: capacity = 2 * capacity
+        for name, dtype in self.FIELDS:
+            grown = np.zeros(capacity, dtype=dtype)
+            grown[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, grown)
+        self.capacity = capacity
+
+    def clear(self) -> int:
+        """
+        Remove all nodes and add a new root.
+
+        :return: The root, node 0.
+        """
+        self.size = 0
+        return self.add(-1, 0, 1, 1)[0]
+
+    def add(self, parent, moves, player, amount=None) -> range:
+        """
+        Add the children of a node (or the root), unvisited and unexpanded.
+
+        :param parent: The parent node, -1 for the root.
+        :param moves: The move from the parent to every child.
+        :param player: The player making those moves, whose point of view the value sums take.
+        :param amount: The amount of children, len(moves) by default.
+        :return: The new nodes.
+        """
+        if amount is None: amount = len(moves)
+        start = self.size
+        end = start + amount
+        if end > self.capacity: self._grow(end)
+        self.parent[start:end] = parent
+        self.first_child[start:end] = UNEXPANDED
+        self.num_children[start:end] = 0
+        self.move[start:end] = moves
+        self.player[start:end] = player
+        self.visits[start:end] = 0
+        self.value_sums[start:end] = 0.0
+        self.key[start:end] = -1
+        self.entry[start:end] = -1
+        self.size = end
+        if parent >= 0:
+            self.first_child[parent] = start
+            self.num_children[parent] = amount
+        return range(start, end)
+
+    def keep_subtree(self, node) -> int:
+        """
+        Make node the root, keeping only its subtree, compacted to the front of the buffers.
+
+        Children are always created after their parent, so the kept nodes in ascending index
+        order start at node, keep every block of children contiguous and only move down.
+
+        :return: The amount of nodes kept.
+        """
+        kept = [np.array([node])]
+        frontier = kept[0]
+        while len(frontier) > 0:
+            firsts = self.first_child[frontier]
+            counts = self.num_children[frontier]
+            expanded = firsts >= 0
+            firsts, counts = firsts[expanded], counts[expanded]
+            #All children of the frontier: the ranges first..first+count, concatenated
+            frontier = np.repeat(firsts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            kept.append(frontier)
+        kept = np.sort(np.concatenate(kept))
+
+        new_index = np.full(self.size, -1, dtype=np.int64)
+        new_index[kept] = np.arange(len(kept))
+        for name, _ in self.FIELDS:
+            array = getattr(self, name)
+            array[:len(kept)] = array[kept]
+        self.size = len(kept)
+        self.parent[1:self.size] = new_index[self.parent[1:self.size]]
+        self.parent[0] = -1
+        first = self.first_child[:self.size]
+        first[first >= 0] = new_index[first[first >= 0]]
+        return self.size
+
+    def children(self, node) -> range:
+        first = int(self.first_child[node])
+        return range(first, first + int(self.num_children[node])) if first >= 0 else range(0)
+
+    def nbytes(self) -> int:
+        """
+        :return: The bytes allocated for the node buffers.
+        """
+        return sum(getattr(self, name).nbytes for name, _ in self.FIELDS)
+
+    def __len__(self):
+        return self.size
+
+
+class TranspositionTable:
+    """
+    Statistics shared by all nodes with the same state, wherever they are in the tree, so that a
+    position reached through different move orders is not evaluated from scratch.
+
+    Entries hold visits and value sums (from the point of view of the player who moved into the
+    state, as in NodeArrays) in fixed NumPy buffers, addressed by the game's 64-bit state key.
+    The table holds at most `capacity` entries; when it is full, the least recently visited
+    eighth is evicted at once. Nodes remember the slot of their entry and check its key, so an
+    evicted and reused slot is never mistaken for theirs.
+    """
+
+    ENTRY_BYTES = 128 #Approximate bytes per entry, buffers plus the key -> slot dict
+    EVICT_FRACTION = 8 #1 / fraction of the entries evicted when the table is full
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        """
+        :param max_entries: The maximum amount of entries.
+        :param max_bytes: Or the approximate memory to use, see ENTRY_BYTES.
+        """
+        if max_entries is None:
+            if max_bytes is None: raise ValueError("Give max_entries or max_bytes")
+            max_entries = max_bytes // self.ENTRY_BYTES
+        self.capacity = max(1, int(max_entries))
+        self.keys = np.full(self.capacity, -1, dtype=np.int64)
+        self.visits = np.zeros(self.capacity, dtype=np.int64)
+        self.value_sums = np.zeros(self.capacity)
+        self.used = np.zeros(self.capacity, dtype=np.int64) #When every entry was last visited
+        self.slots = {} #key -> slot
+        self.free = list(range(self.capacity - 1, -1, -1))
+        self.time = 0
+        self.hits = 0 #Visits that found an entry made by another path or search
+        self.evictions = 0
+
+    def touch(self, key) -> int:
+        """
+        :return: The slot of the entry for key, created (evicting if full) if there is none.
+        """
+        slot = self.slots.get(key)
+        if slot is None:
+            if not self.free: self.evict()
+            slot = self._allocate(key)
+        self.time = self.time + 1
+        self.used[slot] = self.time
+        return slot
+
+    def _allocate(self, key) -> int:
+        slot = self.free.pop()
+        self.slots[key] = slot
+        self.keys[slot] = key
+        self.visits[slot] = 0
+        self.value_sums[slot] = 0.0
+        return slot
+
+    def evict(self, needed=1, keep=None) -> None:
+        """
+        Remove the least recently visited entries, an EVICT_FRACTION'th of the table or `needed`
+        if that is more.
+
+        :param needed: The least amount of entries to remove.
+        :param keep: Slots that must not be evicted, e.g. those of the path being backed up.
+        """
+        used = self.used
+        protected = self.keys == -1 #Free slots have nothing to evict
+        if keep is not None: protected[keep] = True
+        if protected.any():
+            used = np.where(protected, np.iinfo(np.int64).max, used)
+        amount = min(self.capacity - int(np.count_nonzero(protected)), max(needed, self.capacity // self.EVICT_FRACTION))
+        if amount <= 0: return
+        victims = np.argpartition(used, amount - 1)[:amount] if amount < self.capacity else np.arange(self.capacity)
+        for key in self.keys[victims].tolist():
+            del self.slots[key]
+        self.keys[victims] = -1
+        self.free.extend(victims.tolist())
+        self.evictions = self.evictions + amount
+
+    def update(self, keys, values, known) -> np.ndarray:
+        """
+        Add one visit with the given values to the entries of keys.
+
+        The entries already on the path are marked as visited first and kept out of any eviction
+        that making the missing ones needs, so no two keys of one path end up in the same slot.
+
+        :param keys: State keys, distinct.
+        :param values: The value for every key.
+        :param known: Per key, whether its node had been backed up into the table before (to
+                      count the hits).
+        :return: The slots of the entries, -1 for keys that did not fit (a path longer than the
+                 table).
+        """
+        slots = np.array([self.slots.get(key, -1) for key in keys], dtype=np.int64)
+        self.time = self.time + 1
+        found = slots >= 0
+        self.used[slots[found]] = self.time
+        missing = np.flatnonzero(~found)
+        if len(missing) > len(self.free): self.evict(len(missing) - len(self.free), keep=slots[found])
+        for i in missing[:len(self.free)].tolist():
+            slots[i] = self._allocate(keys[i])
+            self.used[slots[i]] = self.time
+
+        found = slots >= 0
+        slots_found = slots[found]
+        self.hits = self.hits + int(np.count_nonzero(~known[found] & (self.visits[slots_found] > 0)))
+        self.visits[slots_found] += 1
+        self.value_sums[slots_found] += np.asarray(values)[found]
+        return slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, key):
+        return key in self.slots
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    """
+    The outcome of one MCTS.search call.
+    """
+    move: int #The recommended move
+    iterations: int #Completed search iterations (playouts)
+    nodes: int #Nodes in the tree
+    elapsed_ms: float #Duration on the search's timer
+    moves: np.ndarray #The root moves, in root child order
+    visits: np.ndarray #Visits of every root move
+    means: np.ndarray #Mean value of every root move, for the player to move at the root
+    reused: int = 0 #Root visits kept from the previous search by subtree reuse
+
+
+class MCTS:
+    """
+    Monte-Carlo tree search for deterministic two-player alternating-move games, with a bandit
+    from SequentialHalvingMAB at the root and UCB1 below it, as the SHUCT agents under Ludii/.
+
+    The root bandit is SequentialHalvingAlgAnyTime_v1 ("anytime", as SHUCTAnyTime),
+    SequentialHalvingAlg ("sh", needs an iteration budget) or UCB1 ("ucb", as ExampleUCT); it
+    picks a root child per iteration, is told the playout result and recommends the move at the
+    end. Below the root the children of a node are all created on its second visit, in a random
+    order, tried once each in that order and then selected by UCB1. Nodes live in NodeArrays, and
+    states are not stored but recomputed by applying the moves along the path from the root.
+
+    A game is any object with these methods, where moves are ints and states are values that
+    apply does not modify:
+    - to_move(state) -> int: the player to move, 0 or 1.
+    - legal_moves(state) -> sequence of int.
+    - apply(state, move) -> state.
+    - is_terminal(state) -> bool.
+    - playout(state, rng) -> float: the result in [-1, 1] for player 0 of a random playout from
+      state (of the state itself if it is terminal), rng being a numpy Generator.
+    - key(state) -> int: only with a transposition table, a hash of the state (including the
+      player to move) of which the low 63 bits are used.
+
+    With reuse=True, play(move) keeps the subtree of every move played, so the next search starts
+    from the statistics gathered below it: the tree is compacted to that subtree and the root
+    bandit is warm-started with the visits and value sums of the kept root children.
+
+    With a TranspositionTable, every node on an iteration's path also backs up into the entry of
+    its state, and UCB1 takes the mean of a child from its entry (the statistics of all its
+    transpositions, across searches) when the entry has seen more visits than the edge; the
+    exploration term keeps the visits of the edge.
+    """
+
+    def __init__(self, game, root="anytime", C=math.sqrt(2), seed=None, capacity=1 << 16, table=None, reuse=False):
+        """
+        :param game: The game, see above.
+        :param root: The root bandit, "anytime", "sh" or "ucb".
+        :param C: The exploration parameter of UCB1 (sqrt(2) as in the Java agents).
+        :param seed: Seed of the random move orders and playouts.
+        :param capacity: Initial node capacity of the tree.
+        :param table: A TranspositionTable to share statistics between transpositions, or None.
+        :param reuse: Whether play keeps the subtree of the move played for the next search.
+        """
+        if root not in ("anytime", "sh", "ucb"): raise ValueError(f"Unknown root bandit: {root}")
+        self.game = game
+        self.root = root
+        self.C = C
+        self.rng = np.random.default_rng(seed)
+        self.tree = NodeArrays(capacity)
+        self.table = table
+        self.reuse = reuse
+        self.kept = False #Whether the tree holds the subtree of the next search's root
+        self.bandit = None
+
+    def make_bandit(self, k, iterations=None, time_budget_ms=None, timer=WALL_TIMER):
+        """
+        :return: A new root bandit over k root moves.
+        """
+        match(self.root):
+            case "anytime":
+                return sh.SequentialHalvingAlgAnyTime_v1(time_budget_ms or 0, False, k, timer=timer)
+            case "sh":
+                if iterations is None: raise ValueError("Sequential halving at the root needs an iteration budget")
+                return sh.SequentialHalvingAlg(False, k, iterations)
+            case "ucb":
+                return sh.UCB1(self.C, k, time_budget_ms or 0, timer=timer)
+
+    def expand(self, node, state) -> None:
+        """
+        Create the children of a node, in a random order, or mark it terminal.
+        """
+        game = self.game
+        if game.is_terminal(state):
+            self.tree.first_child[node] = TERMINAL
+            return
+        moves = np.array(game.legal_moves(state), dtype=np.int64)
+        self.tree.add(node, self.rng.permutation(moves), game.to_move(state))
+
+    def search(self, state, iterations=None, time_budget_ms=None, timer=WALL_TIMER) -> SearchResult:
+        """
+        Search from state until the iteration budget is used or the deadline passes.
+
+        :param state: The root state, not terminal.
+        :param iterations: The amount of iterations, or None for a time budget.
+        :param time_budget_ms: The time budget, used if no iterations are given.
+        :param timer: Source of time for the budget, WALL_TIMER or a clocks.VirtualTimer.
+        """
+        start = timer()
+        tree = self.tree
+        if self.kept:
+            root = 0
+            if tree.first_child[root] == UNEXPANDED: self.expand(root, state)
+        else:
+            root = tree.clear()
+            self.expand(root, state)
+        self.kept = False
+        tree.visits[root] = max(1, tree.visits[root])
+        children = tree.children(root)
+        if len(children) == 0: raise ValueError("The root state has no moves")
+        root_moves = tree.move[children.start:children.stop].tolist()
+        reused = int(tree.visits[children.start:children.stop].sum())
+
+        done = 0
+        if len(children) > 1:
+            self.bandit = bandit = self.make_bandit(len(children), iterations, time_budget_ms, timer)
+            if reused > 0: bandit.warm_start(tree.visits[children.start:children.stop], tree.value_sums[children.start:children.stop])
+            clock = None if iterations is not None else timer.deadline(time_budget_ms)
+            choose, observe, iterate = bandit.choose_arm, bandit.observe_reward, self.iterate
+            first = children.start
+            while (done < iterations) if clock is None else not clock.tick():
+                arm = choose()
+                observe(arm, iterate(first + arm, self.game.apply(state, root_moves[arm])))
+                done = done + 1
+            best = bandit.recommend()
+        else:
+            best = 0
+
+        return SearchResult(root_moves[best], done, len(tree), (timer() - start) / 1_000_000,
+                            np.array(root_moves), tree.visits[children.start:children.stop].copy(),
+                            self.root_means(), reused)
+
+    def play(self, move) -> None:
+        """
+        Tell the engine a move was played from the root state (by either player). With reuse, the
+        tree is cut down to that move's subtree for the next search; otherwise, or if the move was
+        never expanded, the next search starts from scratch.
+        """
+        tree = self.tree
+        self.kept = False
+        if not self.reuse or len(tree) == 0: return
+        children = tree.children(0)
+        played = np.flatnonzero(tree.move[children.start:children.stop] == move)
+        if len(played) == 0: return
+        tree.keep_subtree(children.start + int(played[0]))
+        self.kept = True
+
+    def root_means(self) -> np.ndarray:
+        tree = self.tree
+        children = tree.children(0)
+        visits = tree.visits[children.start:children.stop]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return tree.value_sums[children.start:children.stop] / visits
+
+    def iterate(self, node, state) -> float:
+        """
+        One iteration below the root: select down from a root child with UCB1, expand, play out
+        and back up the result.
+
+        :param node: The root child picked by the root bandit.
+        :param state: Its state.
+        :return: The result for the player to move at the root.
+        """
+        tree, game, table = self.tree, self.game, self.table
+        visits, value_sums, first_child, num_children, move = tree.visits, tree.value_sums, tree.first_child, tree.num_children, tree.move
+        C = self.C
+        path = [node]
+        if table is not None: keys = [game.key(state) & KEY_MASK]
+        while visits[node] > 0:
+            if first_child[node] == UNEXPANDED:
+                self.expand(node, state)
+                visits, value_sums, first_child, num_children, move = tree.visits, tree.value_sums, tree.first_child, tree.num_children, tree.move
+            first = first_child[node]
+            if first == TERMINAL: break
+
+            tried = visits[node] - 1 #Every visit after the first went to a child, in child order
+            if tried < num_children[node]:
+                node = first + tried
+            else:
+                end = first + num_children[node]
+                child_visits = visits[first:end]
+                means = value_sums[first:end] / child_visits
+                if table is not None:
+                    slots = tree.entry[first:end]
+                    #An entry that was evicted and made again can know less than the edge itself
+                    shared = (slots >= 0) & (table.keys[slots] == tree.key[first:end]) & (table.visits[slots] > child_visits)
+                    np.divide(table.value_sums[slots], table.visits[slots], out=means, where=shared)
+                ucbs = means + C * np.sqrt(math.log(visits[node]) / child_visits)
+                node = first + int(ucbs.argmax())
+            state = game.apply(state, int(move[node]))
+            path.append(node)
+            if table is not None: keys.append(game.key(state) & KEY_MASK)
+
+        result = game.playout(state, self.rng)
+        path = np.array(path)
+        values = np.where(tree.player[path] == 0, result, -result)
+        visits[path] += 1
+        value_sums[path] += values
+        if table is not None:
+            known = tree.key[path] >= 0
+            tree.key[path] = keys
+            tree.entry[path] = table.update(keys, values, known)
+        return result if tree.player[path[0]] == 0 else -result
+
+
+class RootParallelMCTS:
+    """
+    Root-parallel MCTS: every worker process runs its own MCTS from the same root state with its
+    own seed, and when its budget ends writes the visits and value sums of the root moves into
+    its row of a shared array. The coordinator sums the rows per move and recommends the move with
+    the highest merged mean, so nothing is sent between processes during the search.
+
+    The game and the search settings are sent to the workers once, when the pool starts.
+    """
+
+    MAX_MOVES = 1024 #Root moves the shared array has room for, grown (with a new pool) when exceeded
+
+    def __init__(self, game, workers=None, root="anytime", C=math.sqrt(2), seed=None, capacity=1 << 16):
+        """
+        :param game: The game, see MCTS. It must be picklable.
+        :param workers: The amount of worker processes, all available cores by default.
+        :param root: The root bandit of every worker, see MCTS.
+        :param seed: Root seed; every search and worker gets its own stream spawned from it.
+        """
+        self.game = game
+        self.workers = parallel.worker_count(workers)
+        self.root = root
+        self.C = C
+        self.capacity = capacity
+        self.seeds = np.random.SeedSequence(seed)
+        self.pool = None
+        self.max_moves = self.MAX_MOVES
+
+    def worker_pool(self, moves):
+        """
+        Returns the pool, starting it (with a shared array for `moves` root moves) if needed.
+        """
+        if self.pool is not None and moves <= self.max_moves: return self.pool
+        self.close()
+        while self.max_moves < moves: self.max_moves = 2 * self.max_moves
+        self.stats = parallel.SharedArray(np.zeros((self.workers, 2, self.max_moves)))
+        self.pool = parallel.worker_pool(self.workers, _init_search_worker,
+                                         (self.game, self.root, self.C, self.capacity, self.stats.spec))
+        self._finalizer = weakref.finalize(self, _close_search_pool, self.pool, self.stats)
+        return self.pool
+
+    def search(self, state, iterations=None, time_budget_ms=None) -> SearchResult:
+        """
+        Search from state in every worker until the iteration budget (per worker) is used or
+        the deadline passes. The deadline is fixed here, before the tasks are submitted, so a
+        worker that starts late (or runs a second task) searches for what is left of the budget.
+
+        :return: The merged result; iterations and nodes are summed over the workers.
+        """
+        start = time.perf_counter_ns()
+        deadline = None if time_budget_ms is None else time.monotonic() + time_budget_ms / 1000
+        moves = list(self.game.legal_moves(state))
+        pool = self.worker_pool(len(moves))
+        stats = self.stats.array
+        stats[:, :, :len(moves)] = 0.0
+        futures = [pool.submit(_search_into_row, row, state, moves, iterations, deadline, seed)
+                   for row, seed in enumerate(self.seeds.spawn(self.workers))]
+        done = [future.result() for future in futures]
+
+        visits = stats[:, 0, :len(moves)].sum(axis=0).astype(np.int64)
+        value_sums = stats[:, 1, :len(moves)].sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = value_sums / visits
+        best = int(np.argmax(np.where(visits > 0, means, -np.inf)))
+        return SearchResult(moves[best], sum(iterations for iterations, _ in done), sum(nodes for _, nodes in done),
+                            (time.perf_counter_ns() - start) / 1_000_000, np.array(moves), visits, means)
+
+    def close(self) -> None:
+        """
+        Shut down the worker pool and release the shared array.
+        """
+        if self.pool is None: return
+        self._finalizer()
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _close_search_pool(pool, stats):
+    pool.shutdown()
+    stats.close()
+
+
+def _init_search_worker(game, root, C, capacity, stats_spec):
+    global _worker_engine, _worker_stats
+    _worker_engine = MCTS(game, root, C, capacity=capacity)
+    _worker_stats = parallel.attach(stats_spec)
+
+
+def _search_into_row(row, state, moves, iterations, deadline, seed):
+    # deadline is absolute (time.monotonic(), which all processes share)
+    engine = _worker_engine
+    engine.rng = np.random.default_rng(seed)
+    time_budget_ms = None if deadline is None else max(0.0, (deadline - time.monotonic()) * 1000)
+    result = engine.search(state, iterations, time_budget_ms)
+    tree = engine.tree
+    children = tree.children(0)
+    positions = {move: i for i, move in enumerate(moves)}
+    columns = [positions[move] for move in result.moves.tolist()]
+    _worker_stats[row, 0, columns] = tree.visits[children.start:children.stop]
+    _worker_stats[row, 1, columns] = tree.value_sums[children.start:children.stop]
+    return result.iterations, result.nodes
@@ -0,0 +1,109 @@
+import numpy as np
+from analysis import rank
+
+
+def best_arm(estimates) -> np.ndarray:
+    """
+    :param estimates: Estimated means (or visits) of shape (k,) or (num_problems, k).
+    :return: The recommended arm, the first one on ties, per problem for stacks.
+    """
+    return np.argmax(estimates, axis=-1)
+
+
+def regret(true_means, best_predicted_mean) -> np.ndarray:
+    """
+    :param true_means: Shape (k,) or (num_problems, k).
+    :param best_predicted_mean: Scalar, or one value per problem.
+    :return: The distance between the best true mean and the predicted one, per problem for stacks.
+    """
+    return np.abs(np.max(true_means, axis=-1) - best_predicted_mean)
+
+
+def simple_regret(true_means, estimates) -> np.ndarray:
+    """
+    :return: The best true mean minus the true mean of the recommended arm, per problem for stacks.
+    """
+    true_means = np.asarray(true_means)
+    chosen = np.take_along_axis(true_means, best_arm(estimates)[..., None], axis=-1)[..., 0]
+    return np.max(true_means, axis=-1) - chosen
+
+
+def correct_identification(true_means, estimates) -> np.ndarray:
+    """
+    :return: Whether the recommended arm is the true best arm, per problem for stacks. The mean
+             over problems is the probability of correct identification.
+    """
+    return best_arm(estimates) == best_arm(true_means)
+
+
+def edit_distance(true_means, estimates, arms_considered=4) -> np.ndarray:
+    """
+    Amount of arms ranked below arms_considered (in the true or the predicted ranking) whose
+    predicted rank differs from their true rank.
+
+    :param true_means: Shape (k,) or (num_problems, k).
+    :param estimates: The estimates, same shape as true_means.
+    :return: The distance, per problem for stacks.
+    """
+    true_ranks = rank(true_means)
+    predicted_ranks = rank(estimates)
+    top = (true_ranks < arms_considered) | (predicted_ranks < arms_considered)
+    return np.count_nonzero(top & (true_ranks != predicted_ranks), axis=-1)
+
+
+def top_m_overlap(true_means, estimates, m=4) -> np.ndarray:
+    """
+    :return: The fraction of the true top m arms that are in the predicted top m, per problem for
+             stacks.
+    """
+    shared = (rank(true_means) <= m) & (rank(estimates) <= m)
+    return np.count_nonzero(shared, axis=-1) / m
+
+
+def kendall_tau(true_means, estimates) -> np.ndarray:
+    """
+    Kendall rank correlation (tau-b, which accounts for ties such as unpulled arms) between the
+    true and the estimated order of the arms, over all k(k-1)/2 pairs of arms at once.
+
+    :return: Tau in [-1, 1] per problem for stacks, nan if either side is all ties.
+    """
+    true_means = np.asarray(true_means, dtype=np.float64)
+    estimates = np.asarray(estimates, dtype=np.float64)
+    single = true_means.ndim == 1
+    true_means = np.atleast_2d(true_means)
+    estimates = np.atleast_2d(estimates)
+    first, second = np.triu_indices(true_means.shape[1], 1)
+    tau = np.empty(true_means.shape[0])
+    rows = max(1, 2**22 // max(1, len(first))) #Bound the pair matrices to a few tens of MB
+    for start in range(0, true_means.shape[0], rows):
+        chunk = slice(start, start + rows)
+        true_signs = np.sign(true_means[chunk, first] - true_means[chunk, second])
+        estimate_signs = np.sign(estimates[chunk, first] - estimates[chunk, second])
+        concordance = np.sum(true_signs * estimate_signs, axis=1)
+        untied = np.count_nonzero(true_signs, axis=1) * np.count_nonzero(estimate_signs, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tau[chunk] = concordance / np.sqrt(untied)
+    return tau[0] if single else tau
+
+
+#Metrics of (true means, estimates), by name. Add a function here to have evaluate report it.
+METRICS = {
+    "simple_regret": simple_regret,
+    "correct_identification": correct_identification,
+    "edit_distance": edit_distance,
+    "top_m_overlap": top_m_overlap,
+    "kendall_tau": kendall_tau,
+}
+
+
+def evaluate(true_means, estimates, names=None) -> dict:
+    """
+    Compute several metrics over whole result matrices.
+
+    :param true_means: Shape (num_problems, k).
+    :param estimates: Estimated means (or visits) of the same shape.
+    :param names: The metrics to compute (keys of METRICS), all by default.
+    :return: {name: array with one value per problem}
+    """
+    if names is None: names = METRICS
+    return {name: METRICS[name](true_means, estimates) for name in names}
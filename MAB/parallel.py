@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class SharedArray:
+    """
+    A NumPy array copied once into shared memory, so that pool workers can attach to it by name
+    instead of receiving a pickled copy with every task.
+    """
+
+    def __init__(self, array):
+        """
+        :param array: The array to share (copied).
+        """
+        array = np.ascontiguousarray(array)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self.array = np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)
+        self.array[...] = array
+        self.spec = (self.shm.name, array.shape, array.dtype.str) #What a worker needs to attach
+
+    def close(self) -> None:
+        """
+        Release and remove the shared memory. Workers must be done with it.
+        """
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_attached = {} #Shared memory attached to by this (worker) process, kept open while in use
+
+
+def attach(spec) -> np.ndarray:
+    """
+    :param spec: The spec of a SharedArray.
+    :return: A view of the shared array, valid for the life of this process.
+    """
+    name, shape, dtype = spec
+    if name not in _attached:
+        # Pool workers share the resource tracker of the process that created the memory, so
+        # attaching does not hand it a second owner; SharedArray.close unlinks it.
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=_attached[name].buf)
+
+
+def shards(n, parts) -> list:
+    """
+    Split range(n) into at most `parts` contiguous ranges of (almost) equal size.
+    """
+    parts = max(1, min(parts, n))
+    bounds = np.linspace(0, n, parts + 1).astype(int)
+    return [range(bounds[i], bounds[i + 1]) for i in range(parts) if bounds[i] < bounds[i + 1]]
+
+
+def worker_count(workers=None) -> int:
+    """
+    :param workers: Requested amount of workers, all available cores by default.
+    """
+    if workers: return workers
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_pool(workers=None, initializer=None, initargs=()) -> ProcessPoolExecutor:
+    """
+    A process pool whose workers run `initializer(*initargs)` once when they start, e.g. to
+    attach to shared arrays.
+    """
+    return ProcessPoolExecutor(max_workers=worker_count(workers), initializer=initializer, initargs=initargs)
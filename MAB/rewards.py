@@ -0,0 +1,146 @@
+import numpy as np
+
+
+class RewardSource:
+    """
+    Gaussian rewards for the arms of one MAB problem, drawn ahead in large blocks from a
+    numpy Generator instead of one scipy norm.rvs call per pull.
+
+    With per_arm=False one stream of standard normals serves the pulls in order. With
+    per_arm=True every arm has its own stream, so the j'th pull of an arm gets the same reward
+    whatever algorithm does the pulling (common random numbers across algorithms).
+
+    The first block is drawn when the source is made, so it is not paid for inside the time
+    budget of the first run that pulls from it.
+    """
+
+    BLOCK = 65536 #Default rewards per refill of the shared stream
+
+    def __init__(self, means, scale=1.0, seed=None, per_arm=False, block=None):
+        """
+        :param means: The true mean of every arm.
+        :param scale: The standard deviation of every reward.
+        :param seed: Seed (int or SeedSequence) of the stream(s).
+        :param per_arm: Whether every arm gets its own stream.
+        :param block: The amount of rewards drawn per refill, per stream. Runs that know how many
+                      pulls they make should pass at most that, as the first block is drawn here.
+        """
+        self.means = np.asarray(means, dtype=np.float64)
+        self._mean_list = self.means.tolist()
+        self.scale = scale
+        self.per_arm = per_arm
+        seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        if per_arm:
+            self.block = block or 256
+            self.rngs = [np.random.default_rng(child) for child in seed.spawn(len(self.means))]
+            self._streams = [[] for _ in self.rngs]
+            self._next = [0] * len(self.rngs)
+            for arm in range(len(self.rngs)): self._refill_arm(arm)
+        else:
+            self.block = block or self.BLOCK
+            self.rng = np.random.default_rng(seed)
+            self._noise = np.empty(0)
+            self._noise_list = []
+            self._refill()
+
+    def _refill(self) -> None:
+        self._noise = self.rng.standard_normal(self.block)
+        self._noise_list = self._noise.tolist()
+        self._at = 0
+
+    def _refill_arm(self, arm) -> None:
+        self._streams[arm] = self.rngs[arm].standard_normal(self.block).tolist()
+        self._next[arm] = 0
+
+    def noise(self, n) -> np.ndarray:
+        """
+        :return: The next n standard normal draws of the shared stream.
+        """
+        if self._at + n <= len(self._noise):
+            draws = self._noise[self._at:self._at + n]
+            self._at = self._at + n
+            return draws
+        parts = []
+        while n > 0:
+            if self._at == len(self._noise): self._refill()
+            take = min(n, len(self._noise) - self._at)
+            parts.append(self._noise[self._at:self._at + take])
+            self._at = self._at + take
+            n = n - take
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def reward(self, arm) -> float:
+        """
+        :param arm: The arm pulled.
+        :return: Its reward.
+        """
+        if self.per_arm:
+            at = self._next[arm]
+            if at == len(self._streams[arm]):
+                self._refill_arm(arm)
+                at = 0
+            self._next[arm] = at + 1
+            return self._mean_list[arm] + self.scale * self._streams[arm][at]
+        at = self._at
+        if at == len(self._noise_list):
+            self._refill()
+            at = 0
+        self._at = at + 1
+        return self._mean_list[arm] + self.scale * self._noise_list[at]
+
+    def rewards(self, arms) -> np.ndarray:
+        """
+        :param arms: The arms pulled, in order (may repeat).
+        :return: Their rewards, aligned with arms.
+        """
+        arms = np.asarray(arms, dtype=np.int64)
+        if not self.per_arm: return self.means[arms] + self.scale * self.noise(len(arms))
+
+        noise = np.empty(len(arms))
+        order = np.argsort(arms, kind="stable")
+        played, starts, counts = np.unique(arms[order], return_index=True, return_counts=True)
+        for arm, start, count in zip(played.tolist(), starts.tolist(), counts.tolist()):
+            draws = []
+            while len(draws) < count:
+                at = self._next[arm]
+                if at == len(self._streams[arm]):
+                    self._refill_arm(arm)
+                    at = 0
+                take = min(count - len(draws), len(self._streams[arm]) - at)
+                draws.extend(self._streams[arm][at:at + take])
+                self._next[arm] = at + take
+            noise[order[start:start + count]] = draws
+        return self.means[arms] + self.scale * noise
+
+
+class BatchedRewardSource(RewardSource):
+    """
+    One shared stream of Gaussian rewards for a (num_problems, k) means matrix, serving one pull
+    per problem at a time for the batched (lockstep) algorithms.
+    """
+
+    def __init__(self, means, scale=1.0, seed=None, block=None):
+        """
+        :param means: (num_problems, k) matrix of true arm means.
+        :param scale: The standard deviation of every reward.
+        :param seed: Seed (int or SeedSequence) of the stream.
+        :param block: The amount of rewards drawn per refill.
+        """
+        super().__init__(np.zeros(0), scale, seed, per_arm=False, block=block or 1 << 20)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.rows = np.arange(self.means.shape[0])
+
+    def rewards(self, arms) -> np.ndarray:
+        """
+        :param arms: The arm pulled in every problem, shape (num_problems,).
+        :return: The reward of every problem.
+        """
+        return self.means[self.rows, arms] + self.scale * self.noise(len(arms))
+
+    def _refill(self) -> None:
+        #Only noise() reads the stream here, so the list reward() uses is not built
+        self._noise = self.rng.standard_normal(self.block)
+        self._at = 0
+
+    def reward(self, arm):
+        raise TypeError("a batched source serves one pull per problem, use rewards()")
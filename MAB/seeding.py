@@ -0,0 +1,76 @@
+import zlib
+import numpy as np
+
+
+MEANS = 0 #Spawn key kinds: the problem means,
+CELL = 1 #one (problem, algorithm, budget, repetition) run,
+BATCH = 2 #or one batched run over all problems,
+PROBLEM = 3 #and the means of synthetic problems generated one at a time
+
+
+class ExperimentSeeds:
+    """
+    Independent, deterministic random streams for every part of an experiment, derived from one
+    root seed with SeedSequence spawn keys.
+
+    A stream is addressed by what it is for, e.g. (problem index, algorithm, budget,
+    repetition), instead of by the order in which streams are requested. The child for key
+    (a, b, ...) is the one root.spawn(a + 1)[a].spawn(b + 1)[b]... would give, so the streams
+    are the same whether a sweep runs serially, in a process pool or across machines.
+    """
+
+    def __init__(self, seed=2079):
+        """
+        :param seed: The root seed (int, sequence of ints or None for fresh entropy).
+        """
+        self.root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+    def child(self, *key) -> np.random.SeedSequence:
+        """
+        :param key: Non-negative ints (or strings, hashed with crc32) addressing the stream.
+        :return: The SeedSequence of that stream.
+        """
+        spawn_key = self.root.spawn_key + tuple(_key_part(part) for part in key)
+        return np.random.SeedSequence(self.root.entropy, spawn_key=spawn_key, pool_size=self.root.pool_size)
+
+    def means(self) -> np.random.SeedSequence:
+        """
+        :return: The stream the problem means are drawn from.
+        """
+        return self.child(MEANS)
+
+    def cell(self, problem, algorithm, budget, repetition=0) -> np.random.SeedSequence:
+        """
+        :param problem: Index of the MAB problem.
+        :param algorithm: Name of the algorithm, e.g. "iteration" or "ucb".
+        :param budget: The iteration or time budget.
+        :param repetition: Index of the repetition of this run.
+        :return: The stream of one run. Spawn from it for the parts of the run (rewards, timer).
+        """
+        return self.child(CELL, problem, algorithm, budget, repetition)
+
+    def batch(self, algorithm, budget, repetition=0) -> np.random.SeedSequence:
+        """
+        :return: The stream of one batched run over all problems.
+        """
+        return self.child(BATCH, algorithm, budget, repetition)
+
+    def problem(self, problem) -> np.random.SeedSequence:
+        """
+        :return: The stream the means of synthetic problem `problem` are drawn from, for
+                 experiments that generate their problems where they run them.
+        """
+        return self.child(PROBLEM, problem)
+
+    def generator(self, *key) -> np.random.Generator:
+        """
+        :return: A Generator on the stream for key, see child.
+        """
+        return np.random.default_rng(self.child(*key))
+
+
+def _key_part(part) -> int:
+    # Strings and non-integral budgets get a stable hash; Python's hash() differs per process.
+    if isinstance(part, (float, np.floating)) and float(part).is_integer(): part = int(part)
+    if isinstance(part, (int, np.integer)) and part >= 0: return int(part)
+    return zlib.crc32(repr(part).encode())
@@ -0,0 +1,153 @@
+import math
+from statistics import NormalDist
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative accuracy (log-spaced buckets, as in DDSketch).
+
+    Every value is counted in the bucket of its magnitude, so quantile estimates are within
+    relative_accuracy of a true value, and memory only grows with the range of the values
+    (about 1400 buckets for 1e-9..1e3 at 1%), never with their count. Merging adds the bucket
+    counts, which makes it exact and associative.
+    """
+
+    MIN_VALUE = 1e-9 #Magnitudes below this are counted as zero
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {} #bucket -> count
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def update_many(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self.count = self.count + len(values)
+        small = np.abs(values) < self.MIN_VALUE
+        self.zeros = self.zeros + int(np.count_nonzero(small))
+        for store, magnitudes in ((self.positive, values[~small & (values > 0)]), (self.negative, -values[~small & (values < 0)])):
+            if len(magnitudes) == 0: continue
+            buckets, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64), return_counts=True)
+            for bucket, count in zip(buckets.tolist(), counts.tolist()):
+                store[bucket] = store.get(bucket, 0) + count
+
+    def update(self, value) -> None:
+        self.update_many([value])
+
+    def merge(self, other) -> "QuantileSketch":
+        """
+        Add the counts of another sketch with the same accuracy into this one.
+        """
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for bucket, count in other_store.items():
+                store[bucket] = store.get(bucket, 0) + count
+        self.zeros = self.zeros + other.zeros
+        self.count = self.count + other.count
+        return self
+
+    def _value(self, bucket) -> float:
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def quantile(self, q) -> float:
+        """
+        :param q: The quantile, between 0 and 1.
+        :return: An estimate within relative_accuracy of the q'th quantile, nan if empty.
+        """
+        if self.count == 0: return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.negative, reverse=True):
+            seen = seen + self.negative[bucket]
+            if seen > rank: return -self._value(bucket)
+        seen = seen + self.zeros
+        if seen > rank: return 0.0
+        for bucket in sorted(self.positive):
+            seen = seen + self.positive[bucket]
+            if seen > rank: return self._value(bucket)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+
+class RunningStats:
+    """
+    Constant-memory mean, variance, min and max of a stream of values (Welford), optionally with
+    a QuantileSketch. Partial statistics, e.g. of the problems of different workers, merge
+    exactly and associatively (Chan et al.), so a sweep never has to keep its per-problem values.
+    """
+
+    def __init__(self, quantiles=False, relative_accuracy=0.01):
+        """
+        :param quantiles: Whether to keep a QuantileSketch of the values.
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 #Sum of squared differences from the mean
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(relative_accuracy) if quantiles else None
+
+    def update(self, value) -> None:
+        self.count = self.count + 1
+        delta = value - self.mean
+        self.mean = self.mean + delta / self.count
+        self.m2 = self.m2 + delta * (value - self.mean)
+        if value < self.min: self.min = value
+        if value > self.max: self.max = value
+        if self.sketch is not None: self.sketch.update(value)
+
+    def update_many(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0: return
+        block = RunningStats()
+        block.count = len(values)
+        block.mean = float(values.mean())
+        block.m2 = float(((values - block.mean) ** 2).sum())
+        block.min = float(values.min())
+        block.max = float(values.max())
+        self._merge_moments(block)
+        if self.sketch is not None: self.sketch.update_many(values)
+
+    def merge(self, other) -> "RunningStats":
+        """
+        Add the statistics of another stream into this one.
+        """
+        self._merge_moments(other)
+        if self.sketch is not None and other.sketch is not None: self.sketch.merge(other.sketch)
+        return self
+
+    def _merge_moments(self, other) -> None:
+        if other.count == 0: return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / count
+        self.m2 = self.m2 + other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def variance(self, ddof=0) -> float:
+        return self.m2 / (self.count - ddof) if self.count > ddof else math.nan
+
+    def std(self, ddof=0) -> float:
+        """
+        :param ddof: 0 for the population standard deviation (as np.std), 1 for the sample one.
+        """
+        return math.sqrt(self.variance(ddof))
+
+    def ci(self, confidence=0.95) -> tuple:
+        """
+        :return: Normal approximation of the confidence interval of the mean.
+        """
+        if self.count < 2: return (math.nan, math.nan)
+        half = NormalDist().inv_cdf(0.5 + confidence / 2) * self.std(1) / math.sqrt(self.count)
+        return (self.mean - half, self.mean + half)
+
+    def quantile(self, q) -> float:
+        """
+        :return: Estimate of the q'th quantile, needs quantiles=True.
+        """
+        if self.sketch is None: raise ValueError("RunningStats was made without quantiles")
+        return self.sketch.quantile(q)
@@ -0,0 +1,69 @@
+import json
+import os
+
+
+class SweepLog:
+    """
+    Append-only log of the finished cells of a sweep, one JSON line per finished shard of
+    problems for one (algo_type, budget, repetition), written and fsynced as soon as the shard is
+    done. Reopening the log after a crash or preemption restores every logged result, so a
+    restarted sweep only runs the problems that are still missing.
+
+    Lines of other experiments (different arms, means, seed or pull cost) are ignored, as is a
+    line torn by a crash in the middle of a write.
+    """
+
+    def __init__(self, path, experiment):
+        """
+        :param path: The log file, created if it does not exist.
+        :param experiment: JSON-able description of the experiment the results belong to.
+        """
+        self.path = path
+        self.experiment = json.loads(json.dumps(experiment)) #As it reads back from the log
+        self.done = {} #(algo_type, budget, repetition) -> {problem: (regret, edit distance)}
+        if not os.path.exists(path): return
+
+        with open(path, "rb") as f:
+            data = f.read()
+        for line in data.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("experiment") != self.experiment: continue
+            cell = self.done.setdefault((record["algo_type"], record["budget"], record["repetition"]), {})
+            for problem, result in zip(record["problems"], record["results"]):
+                cell[problem] = tuple(result)
+        if data and not data.endswith(b"\n"):
+            with open(path, "ab") as f: f.write(b"\n") #Keep the next record off a torn line
+
+    def missing(self, algo_type, budget, repetition, num_problems) -> list:
+        """
+        :return: The problems of a cell that have no logged result yet.
+        """
+        done = self.done.get((algo_type, budget, repetition), {})
+        return [t for t in range(num_problems) if t not in done]
+
+    def append(self, algo_type, budget, repetition, problems, results) -> None:
+        """
+        Persist the results of a finished shard.
+
+        :param problems: The problem indices of the shard.
+        :param results: The (regret, edit distance) of every problem, aligned with problems.
+        """
+        record = {"experiment": self.experiment, "algo_type": algo_type, "budget": budget, "repetition": repetition,
+                  "problems": [int(t) for t in problems], "results": [list(result) for result in results]}
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        cell = self.done.setdefault((algo_type, budget, repetition), {})
+        for problem, result in zip(record["problems"], results):
+            cell[problem] = tuple(result)
+
+    def results(self, algo_type, budget, repetition, num_problems) -> list:
+        """
+        :return: The (regret, edit distance) of every problem of a finished cell, in problem order.
+        """
+        done = self.done[(algo_type, budget, repetition)]
+        return [done[t] for t in range(num_problems)]
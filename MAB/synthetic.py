@@ -0,0 +1,175 @@
+import math
+import numpy as np
+from mcts import MCTS
+
+
+MASK = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+NOISE_SALT = 0x5DEECE66D #Separates the leaf noise stream from the edge increments
+
+
+def mix(x) -> int:
+    """
+    splitmix64 finaliser: a well spread 64-bit hash of a 64-bit int.
+    """
+    x = (x + GOLDEN) & MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK
+    return x ^ (x >> 31)
+
+
+def mix_array(x) -> np.ndarray:
+    """
+    mix on a uint64 array (multiplications wrap around, as the masks do in mix).
+    """
+    x = x + np.uint64(GOLDEN)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def uniform(h):
+    """
+    :return: A value in [-1, 1) from the top 53 bits of a hash (int or uint64 array).
+    """
+    if isinstance(h, np.ndarray): return (h >> np.uint64(11)).astype(np.float64) * 2.0**-52 - 1.0
+    return (h >> 11) * 2.0**-52 - 1.0
+
+
+class SyntheticTree:
+    """
+    A deterministic random game tree (an incremental random tree, as the P-games of Smith & Nau)
+    that is never stored: every node is a path from the root, and everything about it is derived
+    from a 64-bit hash of that path, so the same seed always gives the same game.
+
+    Every move adds an increment in [-1, 1) to a running score. A leaf at `depth` has the value
+
+        correlation * score / sqrt(depth) + sqrt(1 - correlation^2) * noise
+
+    for player 0, with noise in [-1, 1) drawn per leaf, and its result is a win (1) if that value
+    is positive and a loss (-1) otherwise, or, with win_loss=False, the value clipped to [-1, 1]
+    (which makes minimax values, and so regrets, more fine grained). With correlation 1 the
+    results of nearby leaves are strongly related through their shared moves, with 0 every leaf is
+    independent. The players alternate, player 0 first, with `branching` moves per node.
+
+    States are (path hash, depth, score) tuples. Implements the game interface of mcts.MCTS
+    (with key), and gives exact minimax values for subtrees small enough to enumerate.
+    """
+
+    MAX_LEAVES = 1 << 24 #Largest subtree minimax enumerates
+
+    def __init__(self, branching=8, depth=10, correlation=0.8, seed=0, win_loss=True):
+        """
+        :param branching: The amount of moves per node.
+        :param depth: The depth of every leaf.
+        :param correlation: How much leaf results depend on the moves leading to them, in [0, 1].
+        :param seed: Seed of the tree.
+        :param win_loss: Whether leaves are wins and losses, or values in [-1, 1].
+        """
+        self.branching = branching
+        self.depth = depth
+        self.correlation = correlation
+        self.noise = math.sqrt(max(0.0, 1.0 - correlation**2))
+        self.scale = correlation / math.sqrt(depth)
+        self.seed = seed
+        self.win_loss = win_loss
+        self._moves = tuple(range(branching))
+
+    def initial_state(self) -> tuple:
+        return (mix(self.seed & MASK), 0, 0.0)
+
+    def to_move(self, state) -> int:
+        return state[1] & 1
+
+    def legal_moves(self, state) -> tuple:
+        return self._moves if state[1] < self.depth else ()
+
+    def apply(self, state, move) -> tuple:
+        h = mix((state[0] + (move + 1) * GOLDEN) & MASK)
+        return (h, state[1] + 1, state[2] + uniform(h))
+
+    def is_terminal(self, state) -> bool:
+        return state[1] >= self.depth
+
+    def key(self, state) -> int:
+        return state[0]
+
+    def result(self, state) -> float:
+        """
+        :return: The result of a leaf for player 0.
+        """
+        value = self.scale * state[2] + self.noise * uniform(mix(state[0] ^ NOISE_SALT))
+        if self.win_loss: return 1.0 if value > 0 else -1.0
+        return min(1.0, max(-1.0, value))
+
+    def playout(self, state, rng) -> float:
+        h, depth, score = state
+        moves = rng.integers(self.branching, size=self.depth - depth).tolist()
+        for move in moves:
+            h = mix((h + (move + 1) * GOLDEN) & MASK)
+            score = score + uniform(h)
+        return self.result((h, self.depth, score))
+
+    def leaf_results(self, state) -> np.ndarray:
+        """
+        :return: The results of all leaves below state, in move order (the leaf of moves
+                 m1, m2, ... is at index m1 * b^(r-1) + m2 * b^(r-2) + ...).
+        """
+        remaining = self.depth - state[1]
+        if self.branching**remaining > self.MAX_LEAVES:
+            raise ValueError(f"{self.branching}^{remaining} leaves is too many to enumerate")
+        hashes = np.array([state[0]], dtype=np.uint64)
+        scores = np.array([state[2]])
+        offsets = (np.arange(1, self.branching + 1, dtype=np.uint64) * np.uint64(GOLDEN))
+        with np.errstate(over="ignore"):
+            for _ in range(remaining):
+                hashes = mix_array((hashes[:, None] + offsets[None, :]).ravel())
+                scores = np.repeat(scores, self.branching) + uniform(hashes)
+            values = self.scale * scores + self.noise * uniform(mix_array(hashes ^ np.uint64(NOISE_SALT)))
+        if self.win_loss: return np.where(values > 0, 1.0, -1.0)
+        return np.clip(values, -1.0, 1.0)
+
+    def move_values(self, state) -> np.ndarray:
+        """
+        :return: The minimax value (for player 0) of every move from state.
+        """
+        values = self.leaf_results(state)
+        for depth in range(self.depth - 1, state[1], -1):
+            values = values.reshape(-1, self.branching)
+            values = values.max(axis=1) if depth & 1 == 0 else values.min(axis=1)
+        return values
+
+    def minimax(self, state) -> float:
+        """
+        :return: The minimax value of state for player 0.
+        """
+        if self.is_terminal(state): return self.result(state)
+        values = self.move_values(state)
+        return float(values.max() if self.to_move(state) == 0 else values.min())
+
+    def regrets(self, state) -> np.ndarray:
+        """
+        :return: How much worse every move is than the best move for the player to move, in
+                 minimax value.
+        """
+        values = self.move_values(state)
+        if self.to_move(state) == 1: values = -values
+        return values.max() - values
+
+
+def benchmark(roots=("anytime", "sh", "ucb"), iterations=1000, num_trees=20, branching=8, depth=6, correlation=0.8, seed=0, win_loss=False) -> dict:
+    """
+    Search the root of num_trees synthetic trees with every root bandit and score the recommended
+    moves against the exact minimax values.
+
+    :return: {root: (mean regret, fraction of best moves)}
+    """
+    regrets = {root: [] for root in roots}
+    for t in range(num_trees):
+        game = SyntheticTree(branching, depth, correlation, seed=seed * 1_000_003 + t, win_loss=win_loss)
+        state = game.initial_state()
+        move_regrets = game.regrets(state)
+        for root in roots:
+            result = MCTS(game, root=root, seed=t).search(state, iterations=iterations)
+            regrets[root].append(move_regrets[result.move])
+    return {root: (float(np.mean(values)), float(np.mean(np.array(values) == 0))) for root, values in regrets.items()}